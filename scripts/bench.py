@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark the admin scripts against fake_supabase.py at several table sizes.
+
+Usage: python bench.py [--sizes 10000 100000 1000000] [--only db_status ...] [--json results.json]
+
+For each size a fresh fake server is seeded. Each script then runs as its own
+process with VITE_SUPABASE_URL pointed at it. Reported per run: wall time,
+HTTP requests the server received, and the peak RSS of the script process
+(from os.wait4). Backups go to a temporary directory. The deleting runs go
+last, since they change the data.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+SIZES = [10_000, 100_000, 1_000_000]
+DELETE_MINUTES = "30"
+
+SCENARIOS = [
+    ("db_status", ["db_status.py"]),
+    ("db_status --rpc", ["db_status.py", "--rpc"]),
+    ("db_backup", ["db_backup.py", "--out", "{out}/plain"]),
+    ("db_backup --stream", ["db_backup.py", "--stream", "--out", "{out}/stream"]),
+    ("db_backup --stream --compress gzip", ["db_backup.py", "--stream", "--compress", "gzip", "--out", "{out}/gzip"]),
+    ("db_backup --incremental", ["db_backup.py", "--incremental", "--out", "{out}/incremental"]),
+    ("db_backup --incremental (no-op)", ["db_backup.py", "--incremental", "--out", "{out}/incremental"]),
+    ("db_delete --dry-run", ["db_delete_last_minutes.py", DELETE_MINUTES, "--dry-run"]),
+    ("db_delete", ["db_delete_last_minutes.py", DELETE_MINUTES]),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request_count(url):
+    with urllib.request.urlopen(f"{url}/__stats") as resp:
+        return json.load(resp)["requests"]
+
+
+def start_server(rows, port):
+    proc = subprocess.Popen(
+        [sys.executable, str(HERE / "fake_supabase.py"), "--rows", str(rows), "--port", str(port)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    print(f"  {proc.stdout.readline().strip()}")  # printed once seeding is done
+    return proc
+
+
+def run_script(argv, env):
+    """Run one script; return (wall seconds, peak RSS in MB, exit status)."""
+    start = time.monotonic()
+    proc = subprocess.Popen([sys.executable, *argv], cwd=HERE, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return time.monotonic() - start, usage.ru_maxrss / 1024, proc.returncode
+
+
+def bench(sizes, only=None):
+    results = []
+    for rows in sizes:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        print(f"\n{rows:,} rows")
+        server = start_server(rows, port)
+        env = {
+            **os.environ,
+            "VITE_SUPABASE_URL": url,
+            "VITE_SUPABASE_PUBLISHABLE_KEY": "fake",
+            "SUPABASE_SERVICE_ROLE_KEY": "fake",
+            "SUPABASE_SCHEMA_SOURCE": "sql",
+        }
+        try:
+            with tempfile.TemporaryDirectory() as out:
+                for name, argv in SCENARIOS:
+                    if only and not any(name.startswith(o) for o in only):
+                        continue
+                    before = request_count(url)
+                    wall, rss, code = run_script([a.format(out=out) for a in argv], env)
+                    requests = request_count(url) - before
+                    status = "" if code == 0 else f"  (exit {code})"
+                    print(f"  {name:38s} {wall:8.2f}s {requests:7d} req {rss:8.1f} MB{status}")
+                    results.append({"rows": rows, "script": name, "wall_s": round(wall, 3),
+                                    "requests": requests, "peak_rss_mb": round(rss, 1), "exit": code})
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the admin scripts against a local fake Supabase.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="total seeded rows per run")
+    parser.add_argument("--only", nargs="+", help="run only scenarios starting with these names")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = bench(args.sizes, args.only)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"\nResults -> {args.json}")
+
+
+if __name__ == "__main__":
+    main()
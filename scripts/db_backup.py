@@ -1,33 +1,347 @@
 #!/usr/bin/env python3
-"""Export all Supabase tables to CSV files in a backups/ directory."""
+"""Export all Supabase tables to CSV files in a backups/ directory.
 
-import requests
+Usage: python db_backup.py [--stream | --incremental] [--compress gzip|zstd] [--page-size N] [--out DIR]
+       python db_backup.py compact [--compress gzip|zstd] [--out DIR]
+
+--stream pages through each table with keyset pagination on (created_at, id)
+and writes the CSV to disk chunk by chunk, so memory stays flat and
+PostgREST's max-rows cap never truncates a table. It also writes a
+manifest.json with row counts and sha256 checksums per table.
+
+--incremental keeps a per-table (created_at, id) high-water mark in
+backups/incremental.json and only fetches rows past it, writing each run as a
+delta segment. `compact` merges every table's base and deltas into a single
+snapshot directory and rebases the chain onto it.
+
+--out writes to another backups root instead of backups/ (used by bench.py).
+"""
+
+import argparse
+import codecs
+import csv
+import gzip
+import hashlib
+import json
+import os
 from datetime import datetime
-from utils import BASE, HEADERS, ROOT, get_tables
+from pathlib import Path
+from utils import BASE, ROOT, get_tables, pmap, session
+import profiling  # on sys.path via utils
+
+PAGE_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+SUFFIXES = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+BACKUPS = ROOT / "backups"
+STATE_PATH = BACKUPS / "incremental.json"
+
+
+def shown(path):
+    return path.relative_to(ROOT) if path.is_relative_to(ROOT) else path
+
+
+def open_output(path, compress=None):
+    if compress == "gzip":
+        return gzip.open(path, "wb")
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd output needs the 'zstandard' package: pip install zstandard")
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    return open(path, "wb")
+
+
+def open_input(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def keyset_filter(after):
+    """PostgREST `or` filter for rows strictly after the (created_at, id) key.
+
+    created_at is nullable and pages put NULLs first, so after a NULL key (an
+    empty CSV field) come the other NULL rows by id, then every dated row.
+    """
+    ts, row_id = after
+    if not ts:
+        return f"(created_at.not.is.null,and(created_at.is.null,id.gt.{row_id}))"
+    return f'(created_at.gt."{ts}",and(created_at.eq."{ts}",id.gt.{row_id}))'
+
+
+def fetch_page(table, after, page_size):
+    params = {"select": "*", "order": "created_at.asc.nullsfirst,id.asc", "limit": str(page_size)}
+    if after:
+        params["or"] = keyset_filter(after)
+    resp = session.get(
+        f"{BASE}/{table}",
+        params=params,
+        headers={"Accept": "text/csv"},
+        stream=True,
+    )
+    resp.raise_for_status()
+    return resp
+
+
+def split_lines(chunks):
+    """Decode byte chunks and yield them as newline-terminated lines."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    tail = ""
+    for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail + "\n"
+
+
+def csv_records(chunks):
+    """Yield (raw_text, fields) per CSV record; quoted newlines stay in one record."""
+    buf = []
+
+    def lines():
+        for line in split_lines(chunks):
+            buf.append(line)
+            yield line
+
+    for fields in csv.reader(lines()):
+        raw = "".join(buf)
+        buf.clear()
+        if fields:
+            yield raw, fields
+
+
+def stream_table(table, path, compress=None, page_size=PAGE_SIZE, after=None):
+    """Write a table to `path` page by page; return (manifest entry, last key).
+
+    Only one page of rows is ever decoded at a time and each chunk is written as
+    soon as it arrives. Later pages skip their header line so the file is a
+    single CSV. The checksum covers the uncompressed CSV bytes. Only an empty
+    page ends the table: with page_size above PostgREST's max-rows cap every
+    page comes back short.
+    """
+    sha = hashlib.sha256()
+    rows = size = pages = 0
+    header = None
+    with open_output(path, compress) as out:
+        while True:
+            resp = fetch_page(table, after, page_size)
+            page_rows = 0
+            received = size
+            last = None
+            for i, (raw, fields) in enumerate(csv_records(resp.iter_content(CHUNK_SIZE))):
+                if i == 0:
+                    if header is not None:
+                        continue
+                    header = fields
+                else:
+                    page_rows += 1
+                    last = fields
+                data = raw.encode()
+                out.write(data)
+                sha.update(data)
+                size += len(data)
+            pages += 1
+            rows += page_rows
+            profiling.count("http bytes in", size - received)  # streamed, so the session hook cannot see it
+            if not page_rows:
+                break
+            after = (last[header.index("created_at")], last[header.index("id")])
+
+    entry = {
+        "file": path.name,
+        "rows": rows,
+        "bytes": size,
+        "sha256": sha.hexdigest(),
+        "pages": pages,
+        "compress": compress,
+    }
+    return entry, after
+
+
+def export_table(table, backup_dir):
+    resp = session.get(
+        f"{BASE}/{table}",
+        headers={"Accept": "text/csv"},
+    )
+    resp.raise_for_status()
+    csv_text = resp.text
+
+    row_count = max(0, len(csv_text.strip().splitlines()) - 1)
+    path = backup_dir / f"{table}.csv"
+    path.write_text(csv_text)
+    return row_count, path
+
+
+def write_manifest(backup_dir, entries, **extra):
+    manifest = {"created_at": datetime.now().isoformat(timespec="seconds"), **extra, "tables": entries}
+    path = backup_dir / "manifest.json"
+    path.write_text(json.dumps(manifest, indent=2))
+    return path
+
+
+def load_state():
+    if STATE_PATH.exists():
+        return json.loads(STATE_PATH.read_text())
+    return {"tables": {}}
+
+
+def save_state(state):
+    tmp = STATE_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, STATE_PATH)
+
+
+def backup_incremental(tables, backup_dir, compress, page_size):
+    """Fetch rows past each table's watermark and append them as a delta segment.
+
+    Tables are fetched concurrently; the state is saved from this thread after
+    every table, so an interrupted run never records a segment whose rows were
+    not fully written.
+    """
+    state = load_state()
+    entries = {}
+
+    def fetch(table):
+        mark = state["tables"].get(table, {})
+        after = (mark["created_at"], mark["id"]) if mark.get("id") else None
+        path = backup_dir / f"{table}{SUFFIXES[compress]}"
+        entry, last = stream_table(table, path, compress, page_size, after=after)
+        entry["after"] = {"created_at": after[0], "id": after[1]} if after else None
+        return path, entry, last
+
+    for table, (path, entry, last) in zip(tables, pmap(fetch, tables)):
+        mark = state["tables"].get(table, {})
+        if not entry["rows"]:
+            path.unlink()  # and left out of the manifest, which only lists files on disk
+            print(f"  {table}: up to date")
+            continue
+
+        entries[table] = entry
+
+        kind = "delta" if mark.get("segments") else "base"
+        state["tables"][table] = {
+            "created_at": last[0],
+            "id": last[1],
+            "segments": mark.get("segments", []) + [str(path.relative_to(BACKUPS))],
+        }
+        save_state(state)
+        print(f"  {table}: {entry['rows']} new rows ({kind}) -> {shown(path)}")
+    return entries
+
+
+def compact(compress=None):
+    """Merge each table's base and delta segments into one snapshot directory.
+
+    Segments are disjoint keyset ranges in (created_at, id) order, so the merge
+    is a plain concatenation that keeps the first header only. The incremental
+    chain is then rebased onto the snapshot; old segments are left on disk.
+    """
+    state = load_state()
+    if not state["tables"]:
+        print(f"Nothing to compact: {shown(STATE_PATH)} has no segments")
+        return
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    snapshot_dir = BACKUPS / f"{timestamp}_snapshot"
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    entries = {}
+    for table, mark in state["tables"].items():
+        path = snapshot_dir / f"{table}{SUFFIXES[compress]}"
+        sha = hashlib.sha256()
+        rows = size = 0
+        with open_output(path, compress) as out:
+            for n, segment in enumerate(mark["segments"]):
+                with open_input(BACKUPS / segment) as f:
+                    records = csv_records(iter(lambda: f.read(CHUNK_SIZE), b""))
+                    for i, (raw, _) in enumerate(records):
+                        if i == 0 and n > 0:
+                            continue
+                        if i > 0:
+                            rows += 1
+                        data = raw.encode()
+                        out.write(data)
+                        sha.update(data)
+                        size += len(data)
+
+        entries[table] = {
+            "file": path.name,
+            "rows": rows,
+            "bytes": size,
+            "sha256": sha.hexdigest(),
+            "segments": len(mark["segments"]),
+            "compress": compress,
+        }
+        mark["segments"] = [str(path.relative_to(BACKUPS))]
+        print(f"  {table}: {rows} rows from {entries[table]['segments']} segments -> {shown(path)}")
+
+    write_manifest(snapshot_dir, entries, mode="snapshot")
+    save_state(state)
+    print(f"\n  Chain rebased onto {shown(snapshot_dir)}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export all Supabase tables to CSV.")
+    parser.add_argument("command", nargs="?", choices=["backup", "compact"], default="backup")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true", help="keyset-paginated streaming export with manifest")
+    mode.add_argument("--incremental", action="store_true", help="only fetch rows past the stored watermarks")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], help="compress streamed CSVs")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"rows per request (default {PAGE_SIZE})")
+    parser.add_argument("--out", type=Path, help="backups root (default backups/)")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
 
 
 def main():
+    global BACKUPS, STATE_PATH
+    args = parse_args()
+    profiling.start(args)
+    if args.out:
+        BACKUPS = args.out.resolve()
+        STATE_PATH = BACKUPS / STATE_PATH.name
+    if args.command == "compact":
+        compact(args.compress)
+        return
+
     tables = get_tables()
     if not tables:
         print("No tables found in schema.sql")
         return
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-    backup_dir = ROOT / "backups" / timestamp
+    backup_dir = BACKUPS / timestamp
     backup_dir.mkdir(parents=True, exist_ok=True)
 
-    for table in tables:
-        resp = requests.get(
-            f"{BASE}/{table}",
-            headers={**HEADERS, "Accept": "text/csv"},
-        )
-        resp.raise_for_status()
-        csv_text = resp.text
-
-        row_count = max(0, len(csv_text.strip().splitlines()) - 1)
-        path = backup_dir / f"{table}.csv"
-        path.write_text(csv_text)
-        print(f"  {table}: {row_count} rows -> {path.relative_to(ROOT)}")
+    if args.incremental:
+        entries = backup_incremental(tables, backup_dir, args.compress, args.page_size)
+        manifest = write_manifest(backup_dir, entries, mode="delta")
+        print(f"\n  Manifest -> {shown(manifest)}")
+        return
+
+    if not args.stream:
+        for table, (row_count, path) in zip(tables, pmap(lambda t: export_table(t, backup_dir), tables)):
+            print(f"  {table}: {row_count} rows -> {shown(path)}")
+        return
+
+    def export(table):
+        path = backup_dir / f"{table}{SUFFIXES[args.compress]}"
+        return path, stream_table(table, path, args.compress, args.page_size)[0]
+
+    entries = {}
+    for table, (path, entry) in zip(tables, pmap(export, tables)):
+        entries[table] = entry
+        print(f"  {table}: {entry['rows']} rows ({entry['pages']} pages) -> {shown(path)}")
+
+    manifest = write_manifest(backup_dir, entries, mode="full")
+    print(f"\n  Manifest -> {shown(manifest)}")
 
 
 if __name__ == "__main__":
@@ -1,21 +1,115 @@
 #!/usr/bin/env python3
-"""Delete all database entries and storage objects from the last N minutes."""
+"""Delete all database entries and storage objects from the last N minutes.
 
+Usage: python db_delete_last_minutes.py <minutes> [--dry-run] [--batch-size N] [--rpc]
+
+Rows are deleted in bounded batches with `Prefer: return=minimal` so no row
+is sent back. --rpc runs every delete inside admin_purge_since() in a single
+transaction instead. --dry-run only counts what would be removed.
+"""
+
+import argparse
 import sys
 from datetime import datetime, timedelta, timezone
+from functools import partial
 
-import requests
-from utils import BASE, HEADERS, STORAGE_BASE, get_tables_delete_order
+from utils import BASE, STORAGE_BASE, get_tables_delete_levels, get_tables_delete_order, pmap, session
+import profiling  # on sys.path via utils
 
 MAX_MINUTES = 60
+BATCH_SIZE = 1000
+STORAGE_BATCH_SIZE = 100
 
 
-def main():
-    if len(sys.argv) != 2:
-        print(f"Usage: {sys.argv[0]} <minutes>")
-        sys.exit(1)
+def content_range_total(resp):
+    """Row total from Content-Range, or None when the server did not send one (missing or */*)."""
+    total = resp.headers.get("content-range", "").split("/")[-1]
+    return int(total) if total.isdigit() else None
+
 
-    minutes = int(sys.argv[1])
+def count_rows(table, cutoff):
+    resp = session.get(
+        f"{BASE}/{table}",
+        params={"created_at": f"gte.{cutoff}", "select": "id", "limit": "0"},
+        headers={"Prefer": "count=exact"},
+    )
+    resp.raise_for_status()
+    return content_range_total(resp)
+
+
+def delete_rows(table, cutoff, batch_size=BATCH_SIZE):
+    """Delete matching rows batch_size at a time; return how many went.
+
+    If a DELETE comes back without a count, batches go on until a fresh count
+    finds no rows left (or no fewer than last time), and the total is None:
+    unknown.
+    """
+    deleted, left = 0, None
+    while True:
+        resp = session.delete(
+            f"{BASE}/{table}",
+            params={"created_at": f"gte.{cutoff}", "order": "id.asc", "limit": str(batch_size)},
+            headers={"Prefer": "return=minimal, count=exact"},
+        )
+        resp.raise_for_status()
+        n = content_range_total(resp)
+        if n is None:
+            remaining = count_rows(table, cutoff)
+            if remaining is None:
+                raise RuntimeError(f"{table}: the server sends no row counts, cannot tell when the delete is done")
+            deleted = None
+            if not remaining or remaining == left:
+                return None
+            left = remaining
+            continue
+        if deleted is not None:
+            deleted += n
+        if n < batch_size:
+            return deleted
+
+
+def purge_rpc(cutoff, dry_run=False):
+    resp = session.post(
+        f"{BASE}/rpc/admin_purge_since",
+        json={"cutoff": cutoff, "tables": get_tables_delete_order(), "dry_run": dry_run},
+    )
+    resp.raise_for_status()
+    return {r["table_name"]: r["deleted"] for r in resp.json()}
+
+
+def scribble_storage_paths(cutoff):
+    resp = session.get(
+        f"{BASE}/scribbles",
+        params={"created_at": f"gte.{cutoff}", "select": "storage_path"},
+    )
+    resp.raise_for_status()
+    return [r["storage_path"] for r in resp.json() if r.get("storage_path")]
+
+
+def delete_storage(paths, batch_size=STORAGE_BATCH_SIZE):
+    def remove(batch):
+        resp = session.delete(f"{STORAGE_BASE}/object/scribbles", json={"prefixes": batch})
+        resp.raise_for_status()
+        return len(batch)
+
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    return sum(pmap(remove, batches))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete rows and scribbles from the last N minutes.")
+    parser.add_argument("minutes", type=int)
+    parser.add_argument("--dry-run", action="store_true", help="count what would be deleted, delete nothing")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"rows per DELETE (default {BATCH_SIZE})")
+    parser.add_argument("--rpc", action="store_true", help="delete everything in one transaction via admin_purge_since()")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiling.start(args)
+    minutes = args.minutes
     if minutes > MAX_MINUTES:
         print(f"Refusing: {minutes} > {MAX_MINUTES} min. Do it manually to avoid accidents.")
         sys.exit(1)
@@ -24,54 +118,52 @@ def main():
         sys.exit(1)
 
     cutoff = (datetime.now(timezone.utc) - timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
-    tables = get_tables_delete_order()
-
-    print(f"Deleting rows created after {cutoff} (last {minutes} min)\n")
-
-    scribbles_resp = requests.get(
-        f"{BASE}/scribbles",
-        params={"created_at": f"gte.{cutoff}", "select": "storage_path"},
-        headers=HEADERS,
-    )
-    scribbles_resp.raise_for_status()
-    scribble_paths = [r["storage_path"] for r in scribbles_resp.json() if r.get("storage_path")]
+    levels = get_tables_delete_levels()
+    tables = [t for level in levels for t in level]
+
+    verb = "Would delete" if args.dry_run else "Deleting"
+    print(f"{verb} rows created after {cutoff} (last {minutes} min)\n")
+
+    # Counts and the scribble lookup are independent reads, so they go out
+    # together; scribble paths must be read before their rows are deleted.
+    jobs = [partial(scribble_storage_paths, cutoff)] + [partial(count_rows, t, cutoff) for t in tables]
+    scribble_paths, *counts = pmap(lambda job: job(), jobs)
+    expected = dict(zip(tables, counts))
+
+    if args.dry_run:
+        for table in tables:
+            print(f"  {table:25s} {'unknown' if expected[table] is None else expected[table] or '—'}")
+        print(f"\n  Storage 'scribbles':    {len(scribble_paths) or '—'} files")
+        print("\nDry run, nothing deleted.")
+        return
+
+    if args.rpc:
+        deleted = purge_rpc(cutoff)
+    else:
+        # Level by level so children are always gone before their parents.
+        deleted = {}
+        for level in levels:
+            todo = [t for t in level if expected[t] != 0]
+            deleted.update(zip(todo, pmap(lambda t: delete_rows(t, cutoff, args.batch_size), todo)))
 
     warn = False
     for table in tables:
-        count_resp = requests.get(
-            f"{BASE}/{table}",
-            params={"created_at": f"gte.{cutoff}", "select": "id", "limit": "0"},
-            headers={**HEADERS, "Prefer": "count=exact"},
-        )
-        count_resp.raise_for_status()
-        cr = count_resp.headers.get("content-range", "")
-        expected = int(cr.split("/")[-1]) if "/" in cr and cr.split("/")[-1].isdigit() else 0
-
-        resp = requests.delete(
-            f"{BASE}/{table}",
-            params={"created_at": f"gte.{cutoff}"},
-            headers={**HEADERS, "Prefer": "return=representation"},
-        )
-        resp.raise_for_status()
-        deleted = len(resp.json())
-
-        if deleted:
-            status = f"{deleted} deleted"
-        elif expected:
-            status = f"⚠ {expected} found but 0 deleted (RLS blocked)"
+        if table in deleted and deleted[table] is None:
+            status = "deleted, count unknown (no Content-Range total)"
+        elif deleted.get(table):
+            status = f"{deleted[table]} deleted"
+        elif expected[table] is None:
+            status = "unknown (no Content-Range total)"
+        elif expected[table]:
+            status = f"⚠ {expected[table]} found but 0 deleted (RLS blocked)"
             warn = True
         else:
             status = "—"
         print(f"  {table:25s} {status}")
 
     if scribble_paths:
-        del_resp = requests.delete(
-            f"{STORAGE_BASE}/object/scribbles",
-            headers={**HEADERS, "Content-Type": "application/json"},
-            json={"prefixes": scribble_paths},
-        )
-        del_resp.raise_for_status()
-        print(f"\n  Storage 'scribbles':    {len(scribble_paths)} files deleted")
+        removed = delete_storage(scribble_paths)
+        print(f"\n  Storage 'scribbles':    {removed} files deleted")
     else:
         print(f"\n  Storage 'scribbles':    —")
 
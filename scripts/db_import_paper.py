@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Import a whole class of paper-test results from a CSV or XLSX template.
+
+Usage: python db_import_paper.py <file> --class LABEL [--set column=value ...] [--check] [--rpc]
+       python db_import_paper.py --template plantilla.csv [--questions 8]
+
+One row per student: the users_paper columns (age, sex, test_model, ...) plus
+p<n>_a and p<n>_b for each answer a × 10^b. Blank cells are NULL. --set fills
+a column for every row, like the shared fields of AdminDataEntryView. Rows
+without any answer are skipped, as in the admin view.
+
+Every row is checked locally against the NOT NULL and CHECK constraints of
+supabase/schema.sql, and nothing is sent unless the whole file is valid. Each
+student gets a deterministic id: the sheet_id column when present (the id
+printed on personalized sheets, see build_personalized.py), otherwise
+uuid5(--class, student number or row). Users and responses then go out as a
+few large POSTs that ignore duplicates, so a re-run inserts nothing twice.
+--rpc sends everything to admin_import_paper() in one transaction instead.
+"""
+
+import argparse
+import csv
+import re
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from utils import BASE, RETRY_METHODS, load_schema, make_session, pmap
+import profiling  # on sys.path via utils
+
+PAPER_NAMESPACE = uuid.UUID("0b7e6a52-3f1d-4d8e-a1c9-6e2f4b9d8a31")
+BATCH_SIZE = 1000
+QUESTIONS = 8
+ANSWER_RE = re.compile(r"p(\d+)_([ab])$")
+TRUE = {"true", "1", "si", "sí", "s", "x", "yes"}
+FALSE = {"false", "0", "no", "n"}
+USER_COLUMNS = [
+    "age", "sex", "time_of_day", "favorite_subject", "math_mark_last_period",
+    "is_physics_chemistry_student", "school_type", "mood", "test_model",
+]
+DEFAULTS = {"is_physics_chemistry_student": False}
+
+# Inserts ignore duplicates, so retrying a POST can never insert a row twice.
+session = make_session(methods=RETRY_METHODS | {"POST"})
+
+
+def read_table(path: Path) -> list[dict]:
+    """Rows of the first sheet (XLSX) or the file (CSV) as {header: value}."""
+    if path.suffix.lower() == ".xlsx":
+        try:
+            import openpyxl
+        except ImportError:
+            raise SystemExit("XLSX input needs the 'openpyxl' package: pip install openpyxl")
+        ws = openpyxl.load_workbook(path, read_only=True, data_only=True).worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        return [dict(zip(header, values)) for values in rows if any(v not in (None, "") for v in values)]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [
+            {k.strip(): v for k, v in row.items() if k}
+            for row in csv.DictReader(f)
+            if any((v or "").strip() for v in row.values() if isinstance(v, str))
+        ]
+
+
+def coerce(value, kind: str):
+    """A cell as the Python value for a column of SQL type kind; ValueError if it cannot be one."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    text = str(value).strip()
+    size = [int(n) for n in re.findall(r"\d+", kind)]
+    if kind.startswith(("INTEGER", "BIGINT", "SMALLINT")):
+        number = float(text.replace(",", "."))
+        if not number.is_integer():
+            raise ValueError(f"{text!r} is not an integer")
+        return int(number)
+    if kind.startswith("NUMERIC"):
+        number = float(text.replace(",", "."))
+        if len(size) == 2 and abs(round(number, size[1])) >= 10 ** (size[0] - size[1]):
+            raise ValueError(f"{text!r} is out of range for {kind}")
+        return round(number, size[1]) if len(size) == 2 else number
+    if kind.startswith("BOOLEAN"):
+        if text.lower() in TRUE:
+            return True
+        if text.lower() in FALSE:
+            return False
+        raise ValueError(f"{text!r} is not a yes/no value")
+    if size and len(text) > size[0]:
+        raise ValueError(f"{text!r} is longer than {kind}")
+    return text
+
+
+def answer_columns(header) -> list[int]:
+    """Question numbers with both p<n>_a and p<n>_b columns."""
+    found = {}
+    for column in header:
+        m = ANSWER_RE.match(column)
+        if m:
+            found.setdefault(int(m.group(1)), set()).add(m.group(2))
+    return sorted(n for n, parts in found.items() if parts == {"a", "b"})
+
+
+def student_id(row: dict, n: int, label: str | None) -> str:
+    if row.get("sheet_id"):
+        return str(uuid.UUID(str(row["sheet_id"]).strip()))
+    if not label:
+        raise ValueError("no sheet_id; pass --class so the student gets a stable id")
+    student = row.get("student") or n
+    return str(uuid.uuid5(PAPER_NAMESPACE, f"{label}/{str(student).strip()}"))
+
+
+def build_rows(table: list[dict], label: str | None, shared: dict) -> tuple[list, list, list]:
+    """(users, responses, errors) for the whole file; rows are only usable if errors is empty."""
+    schema = load_schema()
+    user_types = schema.columns["users_paper"]
+    response_types = schema.columns["responses_paper"]
+    questions = answer_columns(table[0].keys()) if table else []
+    users, responses, errors = [], [], []
+
+    for n, raw in enumerate(table, 1):
+        raw = {**raw, **shared}
+        problems = []
+        answers = []
+        for q in questions:
+            a, b = raw.get(f"p{q}_a"), raw.get(f"p{q}_b")
+            try:
+                base_a = coerce(a, response_types["base_a"])
+                exp_b = coerce(b, response_types["exp_b"])
+            except ValueError as e:
+                problems.append(f"p{q}: {e}")
+                continue
+            if (base_a is None) != (exp_b is None):
+                problems.append(f"p{q}: missing {'b' if exp_b is None else 'a'}")
+            elif base_a is not None:
+                answers.append((q, base_a, exp_b))
+        if not answers and not problems:
+            continue
+
+        user = {}
+        for column in USER_COLUMNS:
+            try:
+                value = coerce(raw.get(column), user_types[column])
+            except ValueError as e:
+                problems.append(f"{column}: {e}")
+                continue
+            user[column] = DEFAULTS.get(column) if value is None else value
+        try:
+            user["id"] = student_id(raw, n, label)
+        except ValueError as e:
+            problems.append(str(e))
+        problems += schema.violations("users_paper", user)
+
+        for q, base_a, exp_b in answers:
+            response = {
+                "user_id": user.get("id"),
+                "test_model": user.get("test_model"),
+                "question_n": q,
+                "base_a": base_a,
+                "exp_b": exp_b,
+            }
+            problems += [f"p{q}: {p}" for p in schema.violations("responses_paper", response)
+                         if not p.startswith(("user_id", "test_model"))]
+            responses.append(response)
+        users.append(user)
+        errors += [f"row {n}: {p}" for p in problems]
+
+    for uid, times in Counter(u.get("id") for u in users).items():
+        if uid and times > 1:
+            errors.append(f"student id {uid} appears {times} times")
+    return users, responses, errors
+
+
+def insert(table: str, rows: list[dict], on_conflict: str) -> int:
+    """POST rows in BATCH_SIZE chunks (in parallel), ignoring existing ones; return how many were new."""
+    def post(batch):
+        resp = session.post(
+            f"{BASE}/{table}",
+            params={"on_conflict": on_conflict, "select": "id"},
+            json=batch,
+            headers={"Prefer": "resolution=ignore-duplicates, return=representation"},
+        )
+        resp.raise_for_status()
+        return len(resp.json())
+
+    batches = [rows[i:i + BATCH_SIZE] for i in range(0, len(rows), BATCH_SIZE)]
+    return sum(pmap(post, batches))
+
+
+def import_rpc(users: list[dict], responses: list[dict]) -> dict:
+    resp = session.post(f"{BASE}/rpc/admin_import_paper", json={"users": users, "responses": responses})
+    resp.raise_for_status()
+    return {r["table_name"]: r["inserted"] for r in resp.json()}
+
+
+def write_template(path: Path, questions: int):
+    header = ["student", *USER_COLUMNS] + [f"p{q}_{part}" for q in range(1, questions + 1) for part in "ab"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(header)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import paper-test results for a whole class.")
+    parser.add_argument("file", type=Path, nargs="?", help="CSV or XLSX, one row per student")
+    parser.add_argument("--class", dest="label", help="class label, e.g. 'IES Goya 3B 2026' (seeds the student ids)")
+    parser.add_argument("--set", action="append", default=[], metavar="COLUMN=VALUE",
+                        help="value for every row, e.g. --set test_model=B --set school_type=publico")
+    parser.add_argument("--check", action="store_true", help="only validate the file, send nothing")
+    parser.add_argument("--rpc", action="store_true", help="insert everything in one transaction via admin_import_paper()")
+    parser.add_argument("--template", type=Path, help="write an empty CSV template here and exit")
+    parser.add_argument("--questions", type=int, default=QUESTIONS, help=f"questions in the template (default {QUESTIONS})")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if not args.file and not args.template:
+        parser.error("a file to import (or --template) is required")
+    return args
+
+
+def main():
+    args = parse_args()
+    profiling.start(args)
+    if args.template:
+        write_template(args.template, args.questions)
+        print(f"Template -> {args.template}")
+        return
+
+    shared = dict(s.split("=", 1) for s in args.set)
+    start = time.monotonic()
+    users, responses, errors = build_rows(read_table(args.file), args.label, shared)
+    if errors:
+        print(f"{len(errors)} problems in {args.file.name}, nothing imported:\n")
+        for e in errors:
+            print(f"  {e}")
+        sys.exit(1)
+    print(f"{args.file.name}: {len(users)} students, {len(responses)} responses, all valid")
+    if args.check:
+        return
+
+    if args.rpc:
+        inserted = import_rpc(users, responses)
+    else:
+        # Users first: every response references one.
+        inserted = {
+            "users_paper": insert("users_paper", users, "id"),
+            "responses_paper": insert("responses_paper", responses, "user_id,question_n"),
+        }
+    for table, n in inserted.items():
+        total = len(users) if table == "users_paper" else len(responses)
+        print(f"  {table:18s} {n} new, {total - n} already there")
+    print(f"\nDone in {time.monotonic() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
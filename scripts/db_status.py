@@ -1,57 +1,118 @@
 #!/usr/bin/env python3
-"""Show row count and latest created_at for key Supabase tables."""
+"""Show row count and latest created_at for key Supabase tables.
 
-from datetime import date
+Usage: python db_status.py [--rpc] [--estimated] [--watch N]
 
-import requests
-from utils import BASE, HEADERS, get_tables
+--rpc asks the admin_table_stats() function in schema.sql for every table in
+one round trip (and adds table sizes). --estimated uses planner statistics
+instead of exact counts. --watch N redraws the table every N seconds over the
+same keep-alive connection.
+"""
 
+import argparse
+import time
+from datetime import date, datetime
 
-def main():
+from utils import BASE, get_tables, pmap, session
+import profiling  # on sys.path via utils
+
+
+def format_latest(created_at):
+    if not created_at:
+        return "—"
+    ts = created_at[:19].replace("T", " ")
+    return "TODAY " + ts[11:] if ts[:10] == str(date.today()) else ts
+
+
+def format_size(n):
+    for unit in ("B", "kB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def table_status(table, estimated=False):
+    count_resp = session.get(
+        f"{BASE}/{table}",
+        params={"select": "id", "limit": "0"},
+        headers={"Prefer": "count=estimated" if estimated else "count=exact"},
+    )
+    count_resp.raise_for_status()
+    cr = count_resp.headers.get("content-range", "")
+    count = cr.split("/")[-1] if "/" in cr else "?"
+
+    latest_resp = session.get(
+        f"{BASE}/{table}",
+        params={"select": "created_at", "order": "created_at.desc", "limit": "1"},
+    )
+    latest_resp.raise_for_status()
+    data = latest_resp.json()
+    latest = format_latest(data[0]["created_at"]) if data else "—"
+
+    return table, count, latest
+
+
+def fetch_status(estimated=False):
     tables = get_tables()
-    if not tables:
+    return list(pmap(lambda t: table_status(t, estimated), tables))
+
+
+def fetch_status_rpc(estimated=False):
+    resp = session.post(f"{BASE}/rpc/admin_table_stats", json={"estimated": estimated})
+    resp.raise_for_status()
+    return [
+        (r["table_name"], str(r["row_count"]), format_latest(r["latest"]), format_size(r["total_bytes"]))
+        for r in resp.json()
+    ]
+
+
+def print_rows(rows):
+    headers = ["Table", "Rows", "Latest", "Size"][: len(rows[0])]
+    right = {1, 3}
+    col_w = [max([len(h)] + [len(r[i]) for r in rows]) for i, h in enumerate(headers)]
+
+    def line(cells):
+        return "  " + "  ".join(
+            f"{c:>{w}}" if i in right else f"{c:<{w}}" for i, (c, w) in enumerate(zip(cells, col_w))
+        )
+
+    print(line(headers))
+    print("  " + "  ".join("─" * w for w in col_w))
+    for row in rows:
+        print(line(row))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Row count and latest created_at per table.")
+    parser.add_argument("--rpc", action="store_true", help="one round trip via admin_table_stats()")
+    parser.add_argument("--estimated", action="store_true", help="planner estimates instead of exact counts")
+    parser.add_argument("--watch", type=float, metavar="N", help="refresh every N seconds")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    profiling.start(args)
+    if not args.rpc and not get_tables():
         print("No tables found in schema.sql")
         return
 
-    rows = []
-    for table in tables:
-        count_resp = requests.get(
-            f"{BASE}/{table}",
-            params={"select": "id", "limit": "0"},
-            headers={**HEADERS, "Prefer": "count=exact"},
-        )
-        count_resp.raise_for_status()
-        cr = count_resp.headers.get("content-range", "")
-        count = cr.split("/")[-1] if "/" in cr else "?"
-
-        latest_resp = requests.get(
-            f"{BASE}/{table}",
-            params={"select": "created_at", "order": "created_at.desc", "limit": "1"},
-            headers=HEADERS,
-        )
-        latest_resp.raise_for_status()
-        data = latest_resp.json()
-        if data:
-            ts = data[0]["created_at"][:19].replace("T", " ")
-            latest = "TODAY " + ts[11:] if ts[:10] == str(date.today()) else ts
-        else:
-            latest = "—"
-
-        rows.append((table, count, latest))
-
-    rows.sort(key=lambda r: r[2] if r[2] != "—" else "", reverse=True)
-
-    col_w = [max(len(r[i]) for r in rows) for i in range(3)]
-    col_w[0] = max(col_w[0], len("Table"))
-    col_w[1] = max(col_w[1], len("Rows"))
-    col_w[2] = max(col_w[2], len("Latest"))
-
-    hdr = f"  {'Table':<{col_w[0]}}  {'Rows':>{col_w[1]}}  {'Latest':<{col_w[2]}}"
-    sep = f"  {'─' * col_w[0]}  {'─' * col_w[1]}  {'─' * col_w[2]}"
-    print(hdr)
-    print(sep)
-    for table, count, latest in rows:
-        print(f"  {table:<{col_w[0]}}  {count:>{col_w[1]}}  {latest:<{col_w[2]}}")
+    fetch = fetch_status_rpc if args.rpc else fetch_status
+    try:
+        while True:
+            rows = fetch(args.estimated)
+            rows.sort(key=lambda r: r[2] if r[2] != "—" else "", reverse=True)
+            if args.watch:
+                print("\033[H\033[J", end="")
+                print(f"  Every {args.watch:g}s — {datetime.now():%H:%M:%S}  (Ctrl+C to stop)\n")
+            if rows:
+                print_rows(rows)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""Local stand-in for the parts of PostgREST and Storage the admin scripts use.
+
+Usage: python fake_supabase.py [--rows N] [--port 54321] [--seed 0] [--max-rows N] [--verbose]
+
+Tables and columns come from supabase/schema.sql and are filled with N
+synthetic rows in total. Child tables get CHILD_WEIGHT times the rows of the
+others, with created_at spread over the last DAYS days. Point the scripts at
+it with VITE_SUPABASE_URL=http://127.0.0.1:<port>.
+
+Supported: GET and DELETE on /rest/v1/<table> with select, column filters
+(eq, neq, gt, gte, lt, lte, is, in, and their not. forms), the keyset `or`
+filter db_backup sends, order, limit, offset, `Prefer: count=exact|estimated`,
+`Prefer: return=minimal`, Content-Range, and `Accept: text/csv`. Bulk POST
+inserts honour on_conflict, `Prefer: resolution=ignore-duplicates` and the
+schema's NOT NULL and CHECK constraints. Also POST /rest/v1/rpc/admin_table_stats,
+admin_purge_since and admin_import_paper, and the prefix delete on
+/storage/v1/object/<bucket>. GET /__stats returns request counts (not counted
+itself).
+
+Rows are kept sorted by (created_at, id), so created_at ranges and keyset
+pages are found by bisection instead of scanning the table.
+"""
+
+import argparse
+import bisect
+import csv
+import io
+import json
+import random
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from schema import parse_sql
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = ROOT / "supabase" / "schema.sql"
+DAYS = 30
+CHILD_WEIGHT = 8
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+HIGH = "\uffff"  # sorts after every id, for bisecting past a whole created_at value
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "columns", "on_conflict"}
+PURGE_LIMIT = timedelta(minutes=61)  # 1 hour plus slack, as in schema.sql
+
+# Plausible values for columns with CHECK (... IN ...) constraints
+CHOICES = {
+    "sex": ["masculino", "femenino", "otro", "prefiero_no_decir"],
+    "pi_vs_e": ["pi", "e", "no_se"],
+    "device_type": ["mobile", "tablet", "desktop"],
+    "school_type": ["publico", "privado", "concertado"],
+    "mood": ["mal", "regular", "bien", "muy_bien"],
+    "test_model": list("ABCD"),
+    "amigos_test": list("ABCD"),
+}
+
+
+class QueryError(Exception):
+    def __init__(self, message, status=400, code="PGRST100"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def timestamp(value: str) -> str:
+    """Any ISO-8601 timestamp as the fixed-width UTC form rows are stored in."""
+    dt = datetime.fromisoformat(value.strip('"').replace(" ", "T"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime(TS_FORMAT)
+
+
+class Table:
+    """Rows as tuples, sorted by (created_at, id), the order every script pages in."""
+
+    def __init__(self, name: str, columns: dict[str, str]):
+        self.name = name
+        self.types = columns
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.rows = []
+        self.keys = []
+
+    def key(self, row):
+        return row[self.index["created_at"]], row[self.index["id"]]
+
+    def load(self, rows):
+        rows.sort(key=self.key)
+        self.rows = rows
+        self.keys = [self.key(r) for r in rows]
+
+    def remove(self, positions):
+        gone = set(positions)
+        self.rows = [r for i, r in enumerate(self.rows) if i not in gone]
+        self.keys = [k for i, k in enumerate(self.keys) if i not in gone]
+
+    def parse(self, column: str, value: str):
+        if column not in self.types:
+            raise QueryError(f"column {self.name}.{column} does not exist", code="42703")
+        kind = self.types[column]
+        value = value.strip('"')
+        if kind.startswith("TIMESTAMP"):
+            return timestamp(value)
+        if kind.startswith(("INTEGER", "BIGINT", "SMALLINT")):
+            return int(value)
+        if kind.startswith("NUMERIC"):
+            return float(value)
+        if kind.startswith("BOOLEAN"):
+            return value == "true"
+        return value
+
+    def bounds(self, conditions):
+        """[lo, hi) row range implied by created_at and keyset conditions; the rest still filter."""
+        lo, hi = 0, len(self.rows)
+        for cond in conditions:
+            if cond[0] in ("or", "and"):
+                after = cond[0] == "or" and keyset_after(cond[1])
+                if after:
+                    lo = max(lo, bisect.bisect_right(self.keys, after))
+                continue
+            column, op, value, negate = cond
+            if column != "created_at" or negate:
+                continue
+            if op == "gte":
+                lo = max(lo, bisect.bisect_left(self.keys, (value,)))
+            elif op == "gt":
+                lo = max(lo, bisect.bisect_left(self.keys, (value, HIGH)))
+            elif op == "lt":
+                hi = min(hi, bisect.bisect_left(self.keys, (value,)))
+            elif op == "lte":
+                hi = min(hi, bisect.bisect_left(self.keys, (value, HIGH)))
+        return lo, max(lo, hi)
+
+
+def split_top(text: str) -> list[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_condition(table: Table, column: str, expr: str):
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+    if op == "is":
+        value = {"null": None, "true": True, "false": False}[raw]
+    elif op == "in":
+        value = {table.parse(column, v) for v in split_top(raw.strip("()"))}
+    elif op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        value = table.parse(column, raw)
+    else:
+        raise QueryError(f"unsupported operator '{op}'")
+    return column, op, value, negate
+
+
+def parse_logic(table: Table, kind: str, body: str):
+    """`or=(a.op.v,and(b.op.v,...))` -> ("or", [conditions])."""
+    terms = []
+    for term in split_top(body.strip()[1:-1]):
+        m = re.match(r"(and|or)(\(.*\))$", term)
+        if m:
+            terms.append(parse_logic(table, m.group(1), m.group(2)))
+        else:
+            column, _, expr = term.partition(".")
+            terms.append(parse_condition(table, column, expr))
+    return kind, terms
+
+
+def keyset_after(terms):
+    """(ts, id) if terms is db_backup's keyset filter: created_at > ts OR (= ts AND id > id)."""
+    if len(terms) != 2 or terms[0][:2] != ("created_at", "gt") or terms[1][0] != "and":
+        return None
+    inner = terms[1][1]
+    if [t[:2] for t in inner] != [("created_at", "eq"), ("id", "gt")] or inner[0][2] != terms[0][2]:
+        return None
+    return terms[0][2], inner[1][2]
+
+
+def matcher(table: Table, cond):
+    if cond[0] in ("or", "and"):
+        parts = [matcher(table, c) for c in cond[1]]
+        combine = any if cond[0] == "or" else all
+        return lambda row: combine(p(row) for p in parts)
+
+    column, op, value, negate = cond
+    i = table.index[column]
+
+    def test(row):
+        v = row[i]
+        if op == "is":
+            return v is value
+        if v is None:
+            return False
+        if op == "in":
+            return v in value
+        if op == "eq":
+            return v == value
+        if op == "neq":
+            return v != value
+        if op == "gt":
+            return v > value
+        if op == "gte":
+            return v >= value
+        if op == "lt":
+            return v < value
+        return v <= value
+
+    return (lambda row: not test(row)) if negate else test
+
+
+class Query:
+    def __init__(self, table: Table, params: list[tuple[str, str]]):
+        self.table = table
+        self.conditions = []
+        self.select = table.columns
+        self.order = []
+        self.limit = None
+        self.offset = 0
+        for name, value in params:
+            if name == "select" and value != "*":
+                self.select = [c.strip() for c in value.split(",")]
+                for c in self.select:
+                    if c not in table.index:
+                        raise QueryError(f"column {table.name}.{c} does not exist", code="42703")
+            elif name == "order":
+                for part in value.split(","):
+                    column, _, direction = part.partition(".")
+                    if column not in table.index:
+                        raise QueryError(f"column {table.name}.{column} does not exist", code="42703")
+                    self.order.append((column, direction.startswith("desc")))
+            elif name == "limit":
+                self.limit = int(value)
+            elif name == "offset":
+                self.offset = int(value)
+            elif name in ("or", "and"):
+                self.conditions.append(parse_logic(table, name, value))
+            elif name not in RESERVED_PARAMS:
+                self.conditions.append(parse_condition(table, name, value))
+
+    def positions(self, limited: bool = True) -> list[int]:
+        """Matching row positions in the requested order."""
+        table = self.table
+        lo, hi = table.bounds(self.conditions)
+        tests = [matcher(table, c) for c in self.conditions]
+        stop = self.offset + self.limit if limited and self.limit is not None else None
+
+        natural = self.order in ([], [("created_at", False)], [("created_at", False), ("id", False)])
+        reverse = self.order in ([("created_at", True)], [("created_at", True), ("id", True)])
+        if natural or reverse:
+            found = []
+            for i in (range(lo, hi) if natural else range(hi - 1, lo - 1, -1)):
+                if all(t(table.rows[i]) for t in tests):
+                    found.append(i)
+                    if stop is not None and len(found) >= stop:
+                        break
+        else:
+            found = [i for i in range(lo, hi) if all(t(table.rows[i]) for t in tests)]
+            for column, desc in reversed(self.order):
+                c = table.index[column]
+                found.sort(key=lambda i: (table.rows[i][c] is None, table.rows[i][c]), reverse=desc)
+        return found[self.offset:stop] if limited else found
+
+    def count(self) -> int:
+        lo, hi = self.table.bounds(self.conditions)
+        only_bounds = all(
+            (c[0] == "or" and keyset_after(c[1])) or (c[0] == "created_at" and not c[3] and c[1] in ("gt", "gte", "lt", "lte"))
+            for c in self.conditions
+        )
+        return hi - lo if only_bounds else len(self.positions(limited=False))
+
+    def records(self, positions):
+        idx = [self.table.index[c] for c in self.select]
+        return [[self.table.rows[i][j] for j in idx] for i in positions]
+
+
+def to_csv(columns, records) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    for rec in records:
+        writer.writerow(["" if v is None else str(v).lower() if isinstance(v, bool) else v for v in rec])
+    return out.getvalue().encode()
+
+
+def seed_value(rng, column, kind, created_at, parent_ids):
+    if column == "id":
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    if kind.startswith("TIMESTAMP"):
+        return created_at
+    if kind == "UUID":
+        return rng.choice(parent_ids) if parent_ids else str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    if column == "storage_path":
+        return f"{uuid.UUID(int=rng.getrandbits(128), version=4)}.png"
+    if column in CHOICES:
+        return rng.choice(CHOICES[column])
+    if column == "question_n":
+        return rng.randint(1, 8)
+    if column == "exp_b":
+        return rng.randint(0, 9)
+    if kind.startswith(("INTEGER", "BIGINT")):
+        return rng.randint(4, 120)
+    if kind.startswith("NUMERIC"):
+        return round(10 ** rng.uniform(-1, 6), 2)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    return f"{column}_{rng.randrange(10 ** 6)}"
+
+
+class FakeSupabase:
+    def __init__(self, schema, max_rows: int | None = None):
+        self.schema = schema
+        self.max_rows = max_rows  # PostgREST's db-max-rows: caps every read, whatever its limit
+        self.tables = {t: Table(t, schema.columns[t]) for t in schema.tables}
+        self.storage = {"scribbles": set()}
+        self.lock = threading.RLock()
+        self.requests = {}
+
+    def seed(self, rows: int, seed: int = 0):
+        rng = random.Random(seed)
+        weights = {t: CHILD_WEIGHT if self.schema.deps.get(t) else 1 for t in self.schema.tables}
+        total = sum(weights.values())
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=DAYS)
+        for level in self.schema.levels():
+            for name in level:
+                table = self.tables[name]
+                n = max(1, rows * weights[name] // total)
+                parents = [self.tables[p] for p in self.schema.deps.get(name, ()) if p in self.tables]
+                parent_ids = [r[parents[0].index["id"]] for r in parents[0].rows] if parents else None
+                step = (end - start) / n
+                data = []
+                for k in range(n):
+                    created_at = (start + step * (k + rng.random())).strftime(TS_FORMAT)
+                    data.append(tuple(
+                        seed_value(rng, c, kind, created_at, parent_ids) for c, kind in table.types.items()
+                    ))
+                table.load(data)
+        scribbles = self.tables.get("scribbles")
+        if scribbles and "storage_path" in scribbles.index:
+            self.storage["scribbles"] = {r[scribbles.index["storage_path"]] for r in scribbles.rows}
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise QueryError(f'relation "public.{name}" does not exist', status=404, code="42P01")
+        return self.tables[name]
+
+    def table_stats(self, estimated=False):
+        return [
+            {
+                "table_name": name,
+                "row_count": len(t.rows),
+                "latest": t.keys[-1][0] if t.keys else None,
+                "total_bytes": 128 * len(t.rows) + 8192,
+            }
+            for name, t in sorted(self.tables.items())
+        ]
+
+    def insert(self, name, rows, on_conflict=("id",), ignore_duplicates=False):
+        """Append rows in one step (all or nothing); return the ones actually inserted."""
+        table = self.table(name)
+        now = datetime.now(timezone.utc).strftime(TS_FORMAT)
+        keys = [table.index[c] for c in on_conflict]
+        existing = {tuple(r[k] for k in keys) for r in table.rows}
+        new = []
+        for row in rows:
+            unknown = set(row) - set(table.columns)
+            if unknown:
+                raise QueryError(f"column {name}.{sorted(unknown)[0]} does not exist", code="PGRST204")
+            problems = self.schema.violations(name, row)
+            if problems:
+                raise QueryError(f'new row for relation "{name}" violates: {problems[0]}', code="23514")
+            values = {"id": str(uuid.uuid4()), "created_at": now, **row}
+            record = tuple(values.get(c) for c in table.columns)
+            key = tuple(record[k] for k in keys)
+            if key in existing:
+                if ignore_duplicates:
+                    continue
+                raise QueryError(f"duplicate key value violates unique constraint on {name}", 409, "23505")
+            existing.add(key)
+            new.append(record)
+        table.load(table.rows + new)
+        return new
+
+    def import_paper(self, users, responses):
+        return [
+            {"table_name": "users_paper", "inserted": len(self.insert("users_paper", users, ignore_duplicates=True))},
+            {"table_name": "responses_paper", "inserted": len(self.insert(
+                "responses_paper", responses, ("user_id", "question_n"), ignore_duplicates=True))},
+        ]
+
+    def purge_since(self, cutoff, tables, dry_run=False):
+        cutoff = timestamp(cutoff)
+        if cutoff < (datetime.now(timezone.utc) - PURGE_LIMIT).strftime(TS_FORMAT):
+            raise QueryError(f"Refusing to purge more than 1 hour (cutoff {cutoff})", code="P0001")
+        result = []
+        for name in tables:
+            t = self.table(name)
+            lo = bisect.bisect_left(t.keys, (cutoff,))
+            result.append({"table_name": name, "deleted": len(t.keys) - lo})
+            if not dry_run:
+                t.rows, t.keys = t.rows[:lo], t.keys[:lo]
+        return result
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    verbose = False
+
+    @property
+    def db(self) -> FakeSupabase:
+        return self.server.db
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def prefer(self) -> set[str]:
+        return {p.strip() for p in self.headers.get("Prefer", "").split(",") if p.strip()}
+
+    def send(self, status, payload=b"", content_type="application/json", headers=None):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def route(self, method):
+        url = urlsplit(self.path)
+        if url.path == "/__stats":
+            with self.db.lock:
+                return self.send(200, {"requests": sum(self.db.requests.values()), "by_route": self.db.requests})
+        parts = url.path.strip("/").split("/")
+        route = f"{method} {url.path}"
+        params = parse_qsl(url.query, keep_blank_values=True)
+        try:
+            with self.db.lock:
+                self.db.requests[route] = self.db.requests.get(route, 0) + 1
+                if parts[:3] == ["rest", "v1", "rpc"] and method == "POST":
+                    return self.rpc(parts[3], self.body())
+                if parts[:2] == ["rest", "v1"] and len(parts) == 3 and method in ("GET", "HEAD", "DELETE"):
+                    return self.rest(method, self.db.table(parts[2]), params)
+                if parts[:2] == ["rest", "v1"] and len(parts) == 3 and method == "POST":
+                    return self.rest_insert(self.db.table(parts[2]), params, self.body())
+                if parts[:3] == ["storage", "v1", "object"] and len(parts) == 4 and method == "DELETE":
+                    return self.storage_delete(parts[3], self.body())
+            self.send(404, {"message": f"no route for {method} {url.path}"})
+        except QueryError as e:
+            self.send(e.status, {"code": e.code, "message": str(e), "details": None, "hint": None})
+        except (ValueError, KeyError) as e:
+            self.send(400, {"code": "PGRST100", "message": f"bad request: {e}", "details": None, "hint": None})
+
+    def rest(self, method, table: Table, params):
+        query = Query(table, params)
+        if method != "DELETE" and self.db.max_rows:
+            query.limit = min(query.limit or self.db.max_rows, self.db.max_rows)
+        prefer = self.prefer()
+        counted = any(p.startswith("count=") for p in prefer)
+        positions = query.positions()
+
+        if method == "DELETE":
+            deleted = [dict(zip(query.select, r)) for r in query.records(positions)]
+            table.remove(positions)
+            headers = {"Content-Range": f"*/{len(positions)}"} if counted else {}
+            if "return=representation" in prefer:
+                return self.send(200, deleted, headers=headers)
+            return self.send(204, headers=headers)
+
+        total = query.count() if counted else "*"
+        if positions:
+            span = f"{query.offset}-{query.offset + len(positions) - 1}/{total}"
+        else:
+            span = f"*/{total}"
+        records = query.records(positions)
+        if "text/csv" in self.headers.get("Accept", ""):
+            return self.send(200, to_csv(query.select, records), "text/csv; charset=utf-8", {"Content-Range": span})
+        data = [dict(zip(query.select, r)) for r in records]
+        self.send(200, data, headers={"Content-Range": span})
+
+    def rest_insert(self, table: Table, params, body):
+        params = dict(params)
+        prefer = self.prefer()
+        on_conflict = tuple(params.get("on_conflict", "id").split(","))
+        rows = body if isinstance(body, list) else [body]
+        new = self.db.insert(table.name, rows, on_conflict, "resolution=ignore-duplicates" in prefer)
+        if "return=representation" not in prefer:
+            return self.send(201)
+        select = params.get("select", "*")
+        columns = table.columns if select == "*" else select.split(",")
+        self.send(201, [{c: r[table.index[c]] for c in columns} for r in new])
+
+    def rpc(self, name, args):
+        if name == "admin_table_stats":
+            return self.send(200, self.db.table_stats(**args))
+        if name == "admin_purge_since":
+            return self.send(200, self.db.purge_since(**args))
+        if name == "admin_import_paper":
+            return self.send(200, self.db.import_paper(**args))
+        raise QueryError(f"Could not find the function public.{name}", status=404, code="PGRST202")
+
+    def storage_delete(self, bucket, body):
+        objects = self.db.storage.setdefault(bucket, set())
+        removed = [p for p in body.get("prefixes", []) if p in objects]
+        objects.difference_update(removed)
+        self.send(200, [{"name": p, "bucket_id": bucket} for p in removed])
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_HEAD(self):
+        self.route("HEAD")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+
+def serve(rows: int, port: int = 0, seed: int = 0, verbose: bool = False, max_rows: int | None = None) -> ThreadingHTTPServer:
+    """Seed a fake database and return a server bound to 127.0.0.1:port (0 picks one)."""
+    db = FakeSupabase(parse_sql(SCHEMA_PATH.read_text()), max_rows)
+    db.seed(rows, seed)
+    Handler.verbose = verbose
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.db = db
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake of the Supabase REST and Storage APIs.")
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic rows across all tables (default 10000)")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--max-rows", type=int, help="cap rows per read like PostgREST's db-max-rows (default none)")
+    args = parser.parse_args()
+
+    server = serve(args.rows, args.port, args.seed, args.verbose, args.max_rows)
+    host, port = server.server_address
+    sizes = ", ".join(f"{name}={len(t.rows)}" for name, t in server.db.tables.items())
+    print(f"Fake Supabase on http://{host}:{port} ({sizes})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Table graph of the Supabase schema: tables and their foreign-key parents.
+
+Built from supabase/schema.sql or from PostgREST's OpenAPI description, so
+every script sees the same tables in the same dependency order. The SQL parse
+also keeps column CHECK constraints and NOT NULL columns, so rows can be
+validated locally before they are sent.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+FORMAT_VERSION = 3  # bump when the JSON form changes, to invalidate caches
+COLUMN_RE = re.compile(r"\s+(\w+)\s+([A-Za-z]+(?:\s*\([\d,\s]*\))?(?:\s+WITH(?:OUT)?\s+TIME\s+ZONE)?)")
+NOT_COLUMNS = {"CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK"}
+CHECK_RE = re.compile(r"CHECK\s*\((.*)\)", re.IGNORECASE)
+IN_RE = re.compile(r"(\w+)\s+IN\s*\((.*)\)$", re.IGNORECASE)
+COMPARE_RE = re.compile(r"(\w+)\s*(>=|<=|<>|!=|=|>|<)\s*(-?[\d.]+)$")
+COMPARE = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "!=": lambda a, b: a != b,
+}
+
+
+class SchemaCycleError(ValueError):
+    pass
+
+
+@dataclass
+class Schema:
+    tables: list[str]
+    deps: dict[str, set[str]] = field(default_factory=dict)  # child -> parents
+    columns: dict[str, dict[str, str]] = field(default_factory=dict)  # table -> {column: type}
+    checks: dict[str, dict[str, list]] = field(default_factory=dict)  # table -> {column: [[op, value], ...]}
+    required: dict[str, list[str]] = field(default_factory=dict)  # table -> NOT NULL columns without a default
+
+    def levels(self):
+        """Kahn's algorithm: tables grouped so each level only references earlier ones."""
+        known = set(self.tables)
+        pos = {t: i for i, t in enumerate(self.tables)}
+        parents = {t: (self.deps.get(t, set()) & known) - {t} for t in self.tables}
+        children = {t: [] for t in self.tables}
+        for child, ps in parents.items():
+            for p in ps:
+                children[p].append(child)
+
+        indegree = {t: len(ps) for t, ps in parents.items()}
+        level = [t for t in self.tables if not indegree[t]]
+        levels = []
+        while level:
+            levels.append(level)
+            nxt = []
+            for t in level:
+                for child in children[t]:
+                    indegree[child] -= 1
+                    if not indegree[child]:
+                        nxt.append(child)
+            level = sorted(nxt, key=pos.get)
+
+        placed = sum(len(lvl) for lvl in levels)
+        if placed != len(self.tables):
+            cycle = sorted(t for t, n in indegree.items() if n)
+            raise SchemaCycleError(f"Foreign-key cycle between tables: {', '.join(cycle)}")
+        return levels
+
+    def delete_levels(self):
+        """Levels with children first, so deleting level by level never breaks an FK."""
+        return list(reversed(self.levels()))
+
+    def delete_order(self):
+        return [t for level in self.delete_levels() for t in level]
+
+    def violations(self, table, row):
+        """Messages for every NOT NULL or CHECK constraint row breaks; NULLs pass CHECKs, as in SQL."""
+        problems = [f"{c} is required" for c in self.required.get(table, []) if row.get(c) is None]
+        for column, rules in self.checks.get(table, {}).items():
+            value = row.get(column)
+            if value is None:
+                continue
+            for op, expected in rules:
+                ok = value in expected if op == "in" else COMPARE[op](value, expected)
+                if not ok:
+                    shown = f"one of {', '.join(expected)}" if op == "in" else f"{op} {expected}"
+                    problems.append(f"{column}={value!r} must be {shown}")
+        return problems
+
+    def to_json(self):
+        return {
+            "tables": self.tables,
+            "deps": {t: sorted(ps) for t, ps in self.deps.items()},
+            "columns": self.columns,
+            "checks": self.checks,
+            "required": self.required,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        deps = {t: set(ps) for t, ps in data["deps"].items()}
+        return cls(data["tables"], deps, data["columns"], data["checks"], data["required"])
+
+
+def parse_check(body):
+    """[[op, value], ...] for `col IN ('a', 'b')` and `col >= n AND col <= m` checks on one column."""
+    rules = []
+    column = None
+    for term in re.split(r"\s+AND\s+", body.strip(), flags=re.IGNORECASE):
+        term = term.strip()
+        m = IN_RE.match(term)
+        if m:
+            column = m.group(1)
+            rules.append(["in", re.findall(r"'([^']*)'", m.group(2))])
+            continue
+        m = COMPARE_RE.match(term)
+        if not m:
+            return None, []  # anything fancier is left to the database
+        column = m.group(1)
+        value = float(m.group(3))
+        rules.append([m.group(2), int(value) if value.is_integer() else value])
+    return column, rules
+
+
+def parse_sql(sql):
+    tables = []
+    deps = {}
+    columns = {}
+    checks = {}
+    required = {}
+    current_table = None
+    for line in sql.splitlines():
+        m = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", line, re.IGNORECASE)
+        if m:
+            current_table = m.group(1)
+            tables.append(current_table)
+            columns[current_table] = {}
+        elif re.match(r"\s*\);", line):
+            current_table = None
+        elif current_table:
+            col = COLUMN_RE.match(line)
+            if col and col.group(1).upper() not in NOT_COLUMNS:
+                columns[current_table][col.group(1)] = col.group(2).upper()
+                upper = line.upper()
+                if "NOT NULL" in upper and "DEFAULT" not in upper and "PRIMARY KEY" not in upper:
+                    required.setdefault(current_table, []).append(col.group(1))
+            check = CHECK_RE.search(line)
+            if check:
+                column, rules = parse_check(check.group(1))
+                if rules:
+                    checks.setdefault(current_table, {}).setdefault(column, []).extend(rules)
+        if current_table:
+            ref = re.search(r"REFERENCES\s+(\w+)", line, re.IGNORECASE)
+            if ref:
+                deps.setdefault(current_table, set()).add(ref.group(1))
+    return Schema(tables, deps, columns, checks, required)
+
+
+def parse_openapi(spec):
+    """Tables (definitions with a primary key, i.e. not views) from PostgREST's OpenAPI.
+
+    The OpenAPI description has no CHECK constraints; enum columns become `in` checks.
+    """
+    tables = []
+    deps = {}
+    columns = {}
+    checks = {}
+    required = {}
+    for name, definition in spec.get("definitions", {}).items():
+        properties = definition.get("properties", {})
+        notes = [p.get("description", "") for p in properties.values()]
+        if not any("<pk/>" in n for n in notes):
+            continue
+        tables.append(name)
+        columns[name] = {col: p.get("format", "").upper() for col, p in properties.items()}
+        required[name] = [c for c in definition.get("required", []) if "default" not in properties.get(c, {})]
+        enums = {col: [["in", p["enum"]]] for col, p in properties.items() if "enum" in p}
+        if enums:
+            checks[name] = enums
+        for n in notes:
+            for parent in re.findall(r"<fk table='(\w+)'", n):
+                deps.setdefault(name, set()).add(parent)
+    return Schema(tables, deps, columns, checks, required)
@@ -1,11 +1,22 @@
 """Shared Supabase helpers for CLI scripts."""
 
+import json
 import os
-import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from schema import FORMAT_VERSION, Schema, parse_openapi, parse_sql
+
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "utils"))
+from profiling import instrument_session
+
 load_dotenv(ROOT / ".env")
 
 _SUPABASE_URL = os.environ["VITE_SUPABASE_URL"].rstrip("/")
@@ -15,45 +26,100 @@ _ANON_KEY = os.environ["VITE_SUPABASE_PUBLISHABLE_KEY"]
 KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or _ANON_KEY
 HEADERS = {"apikey": KEY, "Authorization": f"Bearer {KEY}"}
 SCHEMA_PATH = ROOT / "supabase" / "schema.sql"
+SCHEMA_CACHE_PATH = ROOT / ".cache" / "schema.json"
+
+MAX_WORKERS = 8
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset({"GET", "HEAD", "DELETE"})
+
+
+def make_session(pool_size=MAX_WORKERS, methods=RETRY_METHODS):
+    """Keep-alive session shared by all threads, retrying 429/5xx with backoff.
+
+    Responses are timed per route for --profile (see utils/profiling.py).
+
+    Only idempotent methods are retried; POSTs fail fast so rows are never
+    inserted twice. Pass methods=RETRY_METHODS | {"POST"} only for inserts
+    that ignore duplicates.
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return instrument_session(s)
+
+
+session = make_session()
+
+
+def pmap(fn, items, workers=MAX_WORKERS):
+    """Run fn over items on a bounded thread pool; yield results in input order."""
+    items = list(items)
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        yield from pool.map(fn, items)
+
+
+_schema_memo = {}
+
+
+def load_schema(source=None):
+    """Schema model, parsed once per schema.sql version.
+
+    source is "sql" (default) or "openapi" (live PostgREST definitions, which
+    also include tables that only exist in the database). Override the default
+    with SUPABASE_SCHEMA_SOURCE in .env. The SQL parse is memoized by file
+    mtime and size (plus the model's format version), in process and in a small JSON file under .cache/.
+    """
+    source = source or os.environ.get("SUPABASE_SCHEMA_SOURCE", "sql")
+    if source == "openapi":
+        if "openapi" not in _schema_memo:
+            resp = session.get(f"{BASE}/", headers={"Accept": "application/openapi+json"})
+            resp.raise_for_status()
+            _schema_memo["openapi"] = parse_openapi(resp.json())
+        return _schema_memo["openapi"]
+
+    stat = SCHEMA_PATH.stat()
+    key = [FORMAT_VERSION, stat.st_mtime_ns, stat.st_size]
+    memo = _schema_memo.get("sql")
+    if memo and memo[0] == key:
+        return memo[1]
+
+    cached = json.loads(SCHEMA_CACHE_PATH.read_text()) if SCHEMA_CACHE_PATH.exists() else {}
+    if cached.get("key") == key:
+        schema = Schema.from_json(cached["schema"])
+    else:
+        schema = parse_sql(SCHEMA_PATH.read_text())
+        SCHEMA_CACHE_PATH.parent.mkdir(exist_ok=True)
+        SCHEMA_CACHE_PATH.write_text(json.dumps({"key": key, "schema": schema.to_json()}))
+    _schema_memo["sql"] = (key, schema)
+    return schema
 
 
 def get_tables():
-    sql = SCHEMA_PATH.read_text()
-    return re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", sql, re.IGNORECASE)
+    return list(load_schema().tables)
 
 
 def get_fk_deps():
     """Return dict: child_table -> set of parent tables it references."""
-    sql = SCHEMA_PATH.read_text()
-    deps = {}
-    current_table = None
-    for line in sql.splitlines():
-        m = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", line, re.IGNORECASE)
-        if m:
-            current_table = m.group(1)
-        if current_table:
-            ref = re.search(r"REFERENCES\s+(\w+)", line, re.IGNORECASE)
-            if ref:
-                deps.setdefault(current_table, set()).add(ref.group(1))
-    return deps
+    return {t: set(ps) for t, ps in load_schema().deps.items()}
 
 
 def get_tables_delete_order():
     """Tables ordered so children (FK dependents) come before parents."""
-    tables = get_tables()
-    deps = get_fk_deps()
-    ordered = []
-    remaining = list(tables)
-    placed = set()
-    while remaining:
-        for t in remaining:
-            parents = deps.get(t, set())
-            if not (parents - placed - {t}):
-                ordered.append(t)
-                placed.add(t)
-                remaining.remove(t)
-                break
-        else:
-            ordered.extend(remaining)
-            break
-    return list(reversed(ordered))
+    return load_schema().delete_order()
+
+
+def get_tables_delete_levels():
+    """Delete order grouped into levels; tables within a level are independent."""
+    return load_schema().delete_levels()
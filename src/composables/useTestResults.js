@@ -1,8 +1,10 @@
 import { ref, computed } from 'vue'
 import { getOnlineResponsesForQuestion } from '@/lib/supabase'
+import { fractionWorse, getDistribution } from '@/lib/distributions'
 
 export function useTestResults(preguntas, respuestas) {
   const allPopulation = ref({}) // keyed by question index (1-based)
+  const allDistributions = ref({}) // precomputed snapshot entries, same keys
   const isLoadingResponses = ref(false)
 
   function logErrBg(r) {
@@ -46,9 +48,13 @@ export function useTestResults(preguntas, respuestas) {
       }
 
       const population = allPopulation.value[questionN] || []
+      const distribution = allDistributions.value[questionN] || null
+      const populationSize = distribution ? distribution.n : population.length
       let percentile = null
       if (logErr === 0) {
         percentile = 1
+      } else if (logErr !== null && distribution) {
+        percentile = fractionWorse(distribution, logErr)
       } else if (logErr !== null && population.length > 0 && hasP) {
         const popLogErrs = population.map(r => {
           if (r <= 0) return null
@@ -61,7 +67,7 @@ export function useTestResults(preguntas, respuestas) {
         }
       }
 
-      return { num: questionN, texto: q.texto, answer, p05: q.p05, p95: q.p95, hasP, logErr, inRange, population, percentile }
+      return { num: questionN, texto: q.texto, answer, p05: q.p05, p95: q.p95, hasP, logErr, inRange, population, distribution, populationSize, percentile }
     })
   })
 
@@ -86,6 +92,11 @@ export function useTestResults(preguntas, respuestas) {
         .map(async (q, i) => {
           const questionN = i + 1
           try {
+            const d = await getDistribution(testModel, questionN, q.p05, q.p95)
+            if (d) {
+              allDistributions.value[questionN] = d
+              return
+            }
             const r = await getOnlineResponsesForQuestion(testModel, questionN)
             allPopulation.value[questionN] = r
           } catch (e) { /* silencioso */ }
@@ -0,0 +1,55 @@
+// distributions.json is built by utils/analysis/build_distributions.py: per test model and
+// question, the population size, answers in range, logErrs (exact or a 101-point quantile
+// sketch) and a log10 histogram, and is committed (see that script for the publish step).
+// Missing or outdated entries fall back to the raw responses.
+const FORMAT_VERSION = 1
+
+let snapshotPromise = null
+
+async function fetchSnapshot() {
+  const response = await fetch('/distributions.json')
+  if (!response.ok || !response.headers.get('content-type')?.includes('json')) return null
+  const snapshot = await response.json()
+  return snapshot.version === FORMAT_VERSION ? snapshot : null
+}
+
+export function loadDistributions() {
+  if (!snapshotPromise) snapshotPromise = fetchSnapshot().catch(() => null)
+  return snapshotPromise
+}
+
+export async function getDistribution(testModel, questionN, p05, p95) {
+  const snapshot = await loadDistributions()
+  const d = snapshot?.questions?.[testModel]?.[String(questionN)]
+  if (!d || d.p05 !== p05 || d.p95 !== p95) return null
+  return d
+}
+
+// Share of the population with a logErr strictly larger than logErr
+export function fractionWorse(d, logErr) {
+  if (!d.n) return null
+  if (logErr === 0) return (d.n - d.in_range) / d.n
+  if (d.errors) {
+    let lo = 0
+    let hi = d.errors.length
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1
+      if (d.errors[mid] <= logErr) lo = mid + 1
+      else hi = mid
+    }
+    return (d.n - lo) / d.n
+  }
+  const q = d.quantiles
+  if (logErr < q[0]) return 1
+  if (logErr >= q[q.length - 1]) return 0
+  let j = 0
+  while (j + 1 < q.length && q[j + 1] <= logErr) j++
+  const cdf = (j + (logErr - q[j]) / (q[j + 1] - q[j])) / (q.length - 1)
+  return 1 - cdf
+}
+
+// Histogram count of the BIN_SIZE-wide log10 bin starting at log
+export function histogramCount(d, log, binSize) {
+  const i = Math.round((log - d.hist.start) / binSize)
+  return i >= 0 && i < d.hist.counts.length ? d.hist.counts[i] : 0
+}
@@ -1,10 +1,25 @@
-import readXlsxFile from 'read-excel-file'
-
 let questionsCache = null
 
+// questions.json is compiled from questions.xlsx by utils/question_bank/compile_questions.py,
+// committed, and checked against the xlsx before every build. If it is missing anyway (SPA
+// fallback returns HTML), parse the workbook instead.
+async function loadCompiled() {
+  const response = await fetch('/questions.json')
+  if (!response.ok || !response.headers.get('content-type')?.includes('json')) return null
+  const { questions, tests } = await response.json()
+  return { questions, tests }
+}
+
 async function loadExcel() {
   if (questionsCache) return questionsCache
 
+  const compiled = await loadCompiled().catch(() => null)
+  if (compiled) {
+    questionsCache = compiled
+    return questionsCache
+  }
+
+  const { default: readXlsxFile } = await import('read-excel-file')
   const response = await fetch('/questions.xlsx')
   const blob = await response.blob()
 
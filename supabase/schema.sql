@@ -314,6 +314,126 @@ CREATE POLICY "Allow read email subscriptions" ON email_subscriptions
 CREATE POLICY "Allow delete email subscriptions" ON email_subscriptions
     FOR DELETE TO anon USING (true);
 
+-- =====================================================
+-- ADMIN FUNCTIONS (used by scripts/)
+-- =====================================================
+
+-- -----------------------------------------------------
+-- admin_table_stats: row count, latest created_at and size of every
+-- public table with a created_at column, in a single call.
+-- estimated = TRUE reads pg_class.reltuples (planner statistics) instead
+-- of count(*); tables never analyzed fall back to an exact count.
+-- SECURITY INVOKER (default) → RLS of the caller applies.
+-- Used by: python scripts/db_status.py --rpc [--estimated]
+-- -----------------------------------------------------
+CREATE OR REPLACE FUNCTION admin_table_stats(estimated BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (table_name TEXT, row_count BIGINT, latest TIMESTAMPTZ, total_bytes BIGINT)
+LANGUAGE plpgsql STABLE
+SET search_path = public
+AS $$
+DECLARE
+    t TEXT;
+    rel REGCLASS;
+BEGIN
+    FOR t IN
+        SELECT c.table_name
+        FROM information_schema.columns c
+        JOIN information_schema.tables it
+          ON it.table_schema = c.table_schema AND it.table_name = c.table_name
+        WHERE c.table_schema = 'public'
+          AND c.column_name = 'created_at'
+          AND it.table_type = 'BASE TABLE'
+        ORDER BY c.table_name
+    LOOP
+        rel := format('public.%I', t)::REGCLASS;
+        table_name := t;
+        total_bytes := pg_total_relation_size(rel);
+        row_count := NULL;
+        IF estimated THEN
+            SELECT cl.reltuples::BIGINT INTO row_count
+            FROM pg_class cl WHERE cl.oid = rel AND cl.reltuples >= 0;
+        END IF;
+        IF row_count IS NULL THEN
+            EXECUTE format('SELECT count(*) FROM public.%I', t) INTO row_count;
+        END IF;
+        EXECUTE format('SELECT max(created_at) FROM public.%I', t) INTO latest;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
+
+-- -----------------------------------------------------
+-- admin_purge_since: delete every row created at/after cutoff from the
+-- given tables, in array order (children first), in one transaction.
+-- dry_run = TRUE only counts. Refuses cutoffs older than 1 hour, same
+-- limit as the script, plus a minute of slack for the client's clock, its
+-- whole-second cutoff and the round trip, so N = 60 is accepted.
+-- SECURITY INVOKER → RLS of the caller applies.
+-- Used by: python scripts/db_delete_last_minutes.py N --rpc
+-- -----------------------------------------------------
+CREATE OR REPLACE FUNCTION admin_purge_since(cutoff TIMESTAMPTZ, tables TEXT[], dry_run BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (table_name TEXT, deleted BIGINT)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    t TEXT;
+BEGIN
+    IF cutoff < NOW() - INTERVAL '61 minutes' THEN
+        RAISE EXCEPTION 'Refusing to purge more than 1 hour (cutoff %)', cutoff;
+    END IF;
+    FOREACH t IN ARRAY tables LOOP
+        table_name := t;
+        IF dry_run THEN
+            EXECUTE format('SELECT count(*) FROM public.%I WHERE created_at >= $1', t)
+                INTO deleted USING cutoff;
+        ELSE
+            EXECUTE format('WITH d AS (DELETE FROM public.%I WHERE created_at >= $1 RETURNING 1) SELECT count(*) FROM d', t)
+                INTO deleted USING cutoff;
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
+
+-- -----------------------------------------------------
+-- admin_import_paper: insert paper students and their responses in one
+-- transaction. users / responses are JSON arrays shaped like the table
+-- rows (users carry their own deterministic id). Rows already present are
+-- skipped (ON CONFLICT DO NOTHING), so re-running an import is harmless.
+-- SECURITY INVOKER → RLS of the caller applies.
+-- Used by: python scripts/db_import_paper.py <file> --rpc
+-- -----------------------------------------------------
+CREATE OR REPLACE FUNCTION admin_import_paper(users JSONB, responses JSONB)
+RETURNS TABLE (table_name TEXT, inserted BIGINT)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    table_name := 'users_paper';
+    WITH i AS (
+        INSERT INTO users_paper (id, age, sex, time_of_day, favorite_subject, math_mark_last_period,
+                                 is_physics_chemistry_student, school_type, mood, test_model)
+        SELECT u.id, u.age, u.sex, u.time_of_day, u.favorite_subject, u.math_mark_last_period,
+               COALESCE(u.is_physics_chemistry_student, FALSE), u.school_type, u.mood, u.test_model
+        FROM jsonb_populate_recordset(NULL::users_paper, users) u
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    ) SELECT count(*) INTO inserted FROM i;
+    RETURN NEXT;
+
+    table_name := 'responses_paper';
+    WITH i AS (
+        INSERT INTO responses_paper (user_id, test_model, question_n, base_a, exp_b)
+        SELECT r.user_id, r.test_model, r.question_n, r.base_a, r.exp_b
+        FROM jsonb_populate_recordset(NULL::responses_paper, responses) r
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    ) SELECT count(*) INTO inserted FROM i;
+    RETURN NEXT;
+END;
+$$;
+
 -- =====================================================
 -- END SCHEMA
 -- =====================================================
@@ -0,0 +1,71 @@
+"""build_dataset round trip: CSV exports -> partitioned Parquet (and IPC) -> load_dataset."""
+
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("numpy")
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "utils" / "analysis"))
+
+import build_dataset  # noqa: E402
+
+USERS = 200  # more distinct time_of_day values than an int8 dictionary holds
+
+
+def write_csv(path: Path, rows: list[dict]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def backups(tmp_path):
+    export = tmp_path / "backups" / "2026-01-01_000000"
+    export.mkdir(parents=True)
+    created = "2026-01-01T10:00:00+00:00"
+    write_csv(export / "users_online.csv", [
+        {"id": f"o{i}", "age": 20, "sex": "femenino", "pi_vs_e": "pi", "device_type": "mobile", "mood": ""}
+        for i in range(USERS)
+    ])
+    write_csv(export / "users_paper.csv", [
+        {"id": f"p{i}", "age": 15, "sex": "masculino", "time_of_day": f"{i // 60:02d}:{i % 60:02d}",
+         "school_type": "publico", "is_physics_chemistry_student": "true"}
+        for i in range(USERS)
+    ])
+    # C7 is question 8, whose p95 (1e16) is an int beyond exact float64.
+    write_csv(export / "responses_online.csv", [
+        {"id": f"ro{i}", "user_id": f"o{i}", "created_at": created, "test_model": "C", "question_n": 7,
+         "response": 10 ** (i % 20), "time": 30}
+        for i in range(USERS)
+    ])
+    write_csv(export / "responses_paper.csv", [
+        {"id": f"rp{i}", "user_id": f"p{i}", "created_at": created, "test_model": "A", "question_n": 1 + i % 8,
+         "base_a": 2.5, "exp_b": i % 6}
+        for i in range(USERS)
+    ])
+    return tmp_path / "backups"
+
+
+def test_round_trip(backups, tmp_path):
+    out = tmp_path / "dataset"
+    table = build_dataset.build(backups, out, ipc=True)
+    assert table.num_rows == 2 * USERS
+
+    # A rebuild swaps the new files in and leaves no temporary directories behind.
+    build_dataset.build(backups, out)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["backups", "dataset", "dataset.arrow"]
+
+    for ipc in (False, True):
+        online = build_dataset.load_dataset(out, filters=[("source", "=", "online")], ipc=ipc)
+        assert online.num_rows == USERS
+        assert set(online.column("question_id").to_pylist()) == {8}
+        assert set(online.column("p95").to_pylist()) == {1e16}
+
+    paper = build_dataset.load_dataset(out, columns=["answer", "time_of_day"], filters=[("source", "=", "paper")])
+    assert paper.column("time_of_day").to_pylist().count("00:00") == 1
+    assert sorted(set(paper.column("answer").to_pylist())) == [2.5 * 10 ** b for b in range(6)]
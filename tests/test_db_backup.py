@@ -0,0 +1,47 @@
+"""db_backup --stream against the fake Supabase, with PostgREST's max-rows cap on."""
+
+import csv
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.append(str(SCRIPTS))
+
+from fake_supabase import serve  # noqa: E402
+
+MAX_ROWS = 50
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = serve(rows=600, max_rows=MAX_ROWS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # utils.py reads the URL and keys at import, and load_dotenv does not override them.
+    os.environ["VITE_SUPABASE_URL"] = "http://%s:%d" % server.server_address
+    os.environ["VITE_SUPABASE_PUBLISHABLE_KEY"] = "test"
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "test"
+    yield server
+    server.shutdown()
+
+
+def test_stream_is_not_truncated_by_max_rows(server, tmp_path):
+    import db_backup
+
+    table = max(server.db.tables, key=lambda t: len(server.db.tables[t].rows))
+    expected = len(server.db.tables[table].rows)
+    assert expected > MAX_ROWS
+
+    path = tmp_path / f"{table}.csv"
+    entry, _ = db_backup.stream_table(table, path, page_size=MAX_ROWS * 4)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert entry["rows"] == len(rows) == expected
+    assert len({r["id"] for r in rows}) == expected
@@ -0,0 +1,231 @@
+# command: `python utils/analysis/build_dataset.py [--backups DIR] [--out DIR] [--ipc]`
+"""Build one tidy, typed response table from the latest database exports.
+
+Each row is one online or paper answer. It holds the user's demographics, the
+test model and question_n, the question id resolved through the `tests`
+sheet, the numeric answer (paper answers normalized from base_a x 10^exp_b),
+the time, the question's p05/p95 and the answer's logErr. The table is written
+as Parquet partitioned by source (out/source=online/, out/source=paper/),
+sorted by test model, question and time, so filters on them skip whole files
+and row groups.
+
+load_dataset() memory-maps the files, so analyses get a pyarrow Table without
+re-joining or re-parsing CSVs. Parquet still decodes its pages. --ipc also
+writes <out>.arrow, an uncompressed Arrow IPC file that load_dataset(ipc=True)
+maps with no decoding and no copy.
+
+Needs pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from exports import BACKUPS, read_rows
+import profiling  # on sys.path via exports
+from scoring import log_errors
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "question_bank"))
+from compile_questions import load_bank
+
+DATASET_DIR = Path(__file__).parent / "output" / "dataset"
+FILTER_OPS = {"=": "equal", "==": "equal", "!=": "not_equal", "<": "less", "<=": "less_equal",
+              ">": "greater", ">=": "greater_equal"}
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("the analysis dataset needs the 'pyarrow' package: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def arrow_schema(pa):
+    # Only for columns with a CHECK list in schema.sql; int8 indices hold 127 values.
+    category = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema([
+        ("response_id", pa.string()),
+        ("source", pa.string()),
+        ("user_id", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("test_model", category),
+        ("question_n", pa.int16()),
+        ("question_id", pa.int32()),
+        ("answer", pa.float64()),
+        ("base_a", pa.float64()),
+        ("exp_b", pa.int16()),
+        ("time", pa.int32()),
+        ("p05", pa.float64()),
+        ("p95", pa.float64()),
+        ("log_err", pa.float64()),
+        ("age", pa.int16()),
+        ("sex", category),
+        ("pi_vs_e", category),
+        ("which_tests_before", pa.string()),
+        ("device_type", category),
+        ("time_of_day", pa.string()),
+        ("favorite_subject", pa.string()),
+        ("math_mark_last_period", pa.float64()),
+        ("is_physics_chemistry_student", pa.bool_()),
+        ("school_type", category),
+        ("mood", category),
+    ])
+
+
+def text(value):
+    return value if value not in (None, "") else None
+
+
+def number(value, kind=float):
+    return kind(float(value)) if value not in (None, "") else None
+
+
+def boolean(value):
+    return None if value in (None, "") else value.lower() in ("true", "t", "1")
+
+
+def user_columns(row: dict) -> dict:
+    """Typed demographics from one users_online or users_paper export row."""
+    return {
+        "age": number(row.get("age"), int),
+        "math_mark_last_period": number(row.get("math_mark_last_period")),
+        "is_physics_chemistry_student": boolean(row.get("is_physics_chemistry_student")),
+        **{k: text(row.get(k)) for k in ("sex", "pi_vs_e", "which_tests_before", "device_type",
+                                         "time_of_day", "favorite_subject", "school_type", "mood")},
+    }
+
+
+def load_users(table: str, backups: Path) -> dict[str, dict]:
+    return {r["id"]: user_columns(r) for r in read_rows(table, backups)}
+
+
+def fact_rows(backups: Path, bank: dict) -> list[dict]:
+    """One dict per response, joined with its user and question."""
+    by_id = {q["id"]: q for q in bank["questions"]}
+
+    def question(model, n):
+        ids = bank["tests"].get(model, [])
+        return by_id.get(ids[n - 1]) if 0 < n <= len(ids) else None
+
+    rows = []
+    for source, responses, users_table in (
+        ("online", "responses_online", "users_online"),
+        ("paper", "responses_paper", "users_paper"),
+    ):
+        users = load_users(users_table, backups)
+        for r in read_rows(responses, backups):
+            n = int(r["question_n"])
+            q = question(r["test_model"], n)
+            base_a = number(r.get("base_a"))
+            exp_b = number(r.get("exp_b"), int)
+            if source == "paper":
+                answer = base_a * 10 ** exp_b if base_a is not None and exp_b is not None else None
+            else:
+                answer = number(r.get("response"))
+            rows.append({
+                "response_id": r["id"],
+                "source": source,
+                "user_id": r["user_id"],
+                "created_at": datetime.fromisoformat(r["created_at"]) if r.get("created_at") else None,
+                "test_model": r["test_model"],
+                "question_n": n,
+                "question_id": q["id"] if q else None,
+                "answer": answer,
+                "base_a": base_a,
+                "exp_b": exp_b,
+                "time": number(r.get("time"), int),
+                # The bank keeps whole ranges as ints, some beyond what float64 holds exactly.
+                "p05": float(q["p05"]) if q and q["p05"] is not None else None,
+                "p95": float(q["p95"]) if q and q["p95"] is not None else None,
+                **users.get(r["user_id"], {}),
+            })
+    return rows
+
+
+def ipc_path(path: Path) -> Path:
+    return path.with_name(path.name + ".arrow")
+
+
+def build(backups: Path = BACKUPS, out: Path = DATASET_DIR, ipc: bool = False):
+    """Write the partitioned dataset (and optionally the IPC file); return the pyarrow Table."""
+    pa, pq = require_pyarrow()
+    with profiling.timer("dataset join"):
+        rows = fact_rows(backups, load_bank())
+    rows.sort(key=lambda r: (r["source"], r["test_model"], r["question_n"],
+                             r["created_at"] is None, r["created_at"] or 0))
+    nan = float("nan")
+    errors = log_errors(
+        [r["answer"] if r["answer"] is not None else nan for r in rows],
+        [r["p05"] if r["p05"] is not None else nan for r in rows],
+        [r["p95"] if r["p95"] is not None else nan for r in rows],
+    )
+    for r, err in zip(rows, errors.tolist()):
+        r["log_err"] = None if err != err else err
+
+    schema = arrow_schema(pa)
+    table = pa.Table.from_pylist(rows, schema=schema)
+
+    # Written next to the old files and swapped in with two renames, so readers
+    # never see half of them, and the old dataset is only deleted once replaced.
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    old = out.with_name(out.name + ".old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    with profiling.timer("dataset write parquet"):
+        pq.write_to_dataset(table, str(tmp), partition_cols=["source"], compression="zstd")
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+    if ipc:
+        tmp = out.with_name(out.name + ".arrow.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, ipc_path(out))
+    return table
+
+
+def load_dataset(path: Path = DATASET_DIR, columns: list[str] | None = None, filters=None, ipc: bool = False):
+    """The response table as a pyarrow Table, read through a memory map.
+
+    filters use pyarrow's form, e.g. [("source", "=", "online"), ("test_model", "=", "A")],
+    and skip partitions and row groups that cannot match. ipc=True maps <path>.arrow
+    instead, with no decoding (columns and filters are then applied after the map).
+    """
+    pa, pq = require_pyarrow()
+    if ipc:
+        table = pa.ipc.open_file(pa.memory_map(str(ipc_path(path)))).read_all()
+        if filters:
+            import pyarrow.compute as pc
+            for column, op, value in filters:
+                table = table.filter(getattr(pc, FILTER_OPS[op])(table[column], value))
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True, partitioning="hive")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the joined Parquet response dataset from the latest exports.")
+    parser.add_argument("--backups", type=Path, default=BACKUPS, help="backups directory (default backups/)")
+    parser.add_argument("--out", type=Path, default=DATASET_DIR, help="dataset directory")
+    parser.add_argument("--ipc", action="store_true", help="also write an Arrow IPC file for zero-copy loads")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
+
+    start = time.monotonic()
+    table = build(args.backups, args.out, args.ipc)
+    built = time.monotonic() - start
+    start = time.monotonic()
+    load_dataset(args.out)
+    loaded = time.monotonic() - start
+    size = sum(p.stat().st_size for p in args.out.rglob("*.parquet"))
+    print(f"✅ {args.out}: {table.num_rows} responses, {size / 1024:.1f} KB of Parquet "
+          f"(built in {built:.2f}s, loads in {loaded * 1000:.0f} ms)")
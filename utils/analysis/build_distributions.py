@@ -0,0 +1,96 @@
+# command: `python utils/analysis/build_distributions.py [--backups DIR]`
+"""Publish per-question population distributions as public/distributions.json.
+
+For every test model and question with a range, the snapshot holds the
+population size, how many answers fall inside [p05, p95], and the logErr
+distribution. Up to EXACT_MAX answers it stores the exact sorted logErrs;
+above that, a 101-point quantile sketch (0th, 1st, ..., 100th percentile). It
+also stores counts of log10(answer) in BIN_SIZE-wide bins for the results
+histogram. The results screen fetches this one small file instead of every raw
+response, and falls back to the raw query for questions missing from it or
+whose range has changed since it was built.
+
+The snapshot needs the database exports, so it cannot be built on deploy.
+Publishing is: python scripts/db_backup.py, then this script, then commit
+public/distributions.json; the next deploy serves it. `npm run build` warns
+when the file is missing or more than two weeks old (check_distributions.mjs).
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from exports import BACKUPS, read_rows
+import profiling  # on sys.path via exports
+from scoring import log_errors, question_ranges
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "question_bank"))
+from compile_questions import load_bank
+
+ROOT = Path(__file__).resolve().parents[2]
+OUTPUT_PATH = ROOT / "public" / "distributions.json"
+FORMAT_VERSION = 1
+EXACT_MAX = 256
+BIN_SIZE = 0.5  # same as ResponseHistogram.vue
+
+
+def histogram(answers: np.ndarray) -> dict:
+    logs = np.log10(answers)
+    bins = np.floor(logs / BIN_SIZE).astype(int)
+    first = int(bins.min())
+    return {"start": first * BIN_SIZE, "counts": np.bincount(bins - first).tolist()}
+
+
+def distribution(answers: np.ndarray, p05: float, p95: float) -> dict:
+    errors = np.sort(log_errors(answers, p05, p95))
+    entry = {"p05": p05, "p95": p95, "n": len(errors), "in_range": int(np.count_nonzero(errors == 0))}
+    if len(errors) <= EXACT_MAX:
+        entry["errors"] = np.round(errors, 6).tolist()
+    else:
+        entry["quantiles"] = np.round(np.quantile(errors, np.linspace(0, 1, 101)), 6).tolist()
+    entry["hist"] = histogram(answers)
+    return entry
+
+
+def build(backups: Path = BACKUPS, output: Path = OUTPUT_PATH) -> dict:
+    ranges = question_ranges(load_bank())
+    answers = {}
+    for r in read_rows("responses_online", backups):
+        if r["response"] in (None, ""):
+            continue
+        value = float(r["response"])
+        if value > 0:
+            answers.setdefault((r["test_model"], int(r["question_n"])), []).append(value)
+
+    questions = {}
+    for (model, n), values in sorted(answers.items()):
+        if (model, n) in ranges:
+            questions.setdefault(model, {})[str(n)] = distribution(np.array(values), *ranges[(model, n)])
+
+    snapshot = {
+        "version": FORMAT_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "bin_size": BIN_SIZE,
+        "questions": questions,
+    }
+    output.write_text(json.dumps(snapshot, separators=(",", ":")), encoding="utf-8")
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build public/distributions.json from the latest exports.")
+    parser.add_argument("--backups", type=Path, default=BACKUPS, help="backups directory (default backups/)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
+
+    start = time.monotonic()
+    snapshot = build(args.backups)
+    n = sum(q["n"] for model in snapshot["questions"].values() for q in model.values())
+    size = OUTPUT_PATH.stat().st_size
+    print(f"✅ {OUTPUT_PATH.relative_to(ROOT)}: {n} responses, {size / 1024:.1f} KB ({time.monotonic() - start:.2f}s)")
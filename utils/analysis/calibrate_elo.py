@@ -0,0 +1,161 @@
+# command: `python utils/analysis/calibrate_elo.py [--reset] [--dry-run] [--backups DIR]`
+"""Calibrate question difficulty (the `elo` column) from real responses.
+
+Every answer in responses_online, responses_paper and responses_play_random is
+replayed, oldest first, as a match between the respondent and the question.
+The respondent scores s = max(0, 1 - logErr): 1 inside [p05, p95], 0 when an
+order of magnitude or more off. Both ratings then move by the usual Elo rule
+against the expected score 1 / (1 + 10^((R_question - R_user) / 400)), so a
+higher question elo means a harder question, on the same 1000-centred scale
+as AdminDificultadView. Random-play answers are anonymous. They are played
+against a fixed average player who is never updated.
+
+Ratings and the last processed (created_at, id) are kept in .cache/elo_state.json,
+so a nightly run only replays the responses added since. Questions without a
+stored rating start from the workbook's elo, or 1000; that seed is kept in the
+state, so --reset replays from it rather than from a previous write-back.
+Answers to questions without a range are skipped.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from exports import BACKUPS, read_rows
+import profiling  # on sys.path via exports
+from scoring import log_errors
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "question_bank"))
+sys.path.append(str(Path(__file__).resolve().parents[1] / "llm_solver"))
+from compile_questions import load_bank
+from workbook import QuestionBank
+
+ROOT = Path(__file__).resolve().parents[2]
+STATE_PATH = ROOT / ".cache" / "elo_state.json"
+BASE_RATING = 1000.0
+K_QUESTION = 8
+K_USER = 32
+ANONYMOUS = "anonymous"
+
+
+def load_state(reset: bool = False) -> dict:
+    """Saved ratings, or fresh ones on reset. Seeds survive a reset: by then the workbook
+    elo is our own write-back, and replaying on top of it would count every response twice."""
+    old = json.loads(STATE_PATH.read_text()) if STATE_PATH.exists() else None
+    if old and not reset:
+        old.setdefault("seeds", {})
+        return old
+    # States written before seeds were kept: their questions' workbook elo is already calibrated.
+    seeds = {**{key: BASE_RATING for key in old["questions"]}, **old.get("seeds", {})} if old else {}
+    return {"watermark": None, "questions": {}, "users": {}, "matches": 0, "seeds": seeds}
+
+
+def save_state(state: dict):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, STATE_PATH)
+
+
+def new_matches(bank: dict, backups: Path, watermark: list | None) -> list[tuple]:
+    """(created_at, id, user, question id, answer) for responses after watermark, oldest first."""
+    test_ids = bank["tests"]
+    after = tuple(watermark) if watermark else None
+    matches = []
+
+    def add(r, user, qid, answer):
+        key = (r["created_at"], r["id"])
+        if qid is not None and answer and (after is None or key > after):
+            matches.append((*key, user, qid, float(answer)))
+
+    def test_question(model, n):
+        ids = test_ids.get(model, [])
+        return ids[n - 1] if 0 < n <= len(ids) else None
+
+    for r in read_rows("responses_online", backups):
+        add(r, r["user_id"], test_question(r["test_model"], int(r["question_n"])), r["response"])
+    for r in read_rows("responses_paper", backups):
+        answer = float(r["base_a"]) * 10 ** int(r["exp_b"])
+        add(r, r["user_id"], test_question(r["test_model"], int(r["question_n"])), answer)
+    for r in read_rows("responses_play_random", backups):
+        add(r, ANONYMOUS, int(r["id_play_question"]), r["response"])
+    matches.sort()
+    return matches
+
+
+def replay(state: dict, bank: dict, matches: list[tuple]) -> dict[int, int]:
+    """Update the ratings in state in place; return matches played per question."""
+    by_id = {q["id"]: q for q in bank["questions"]}
+    ranged = [m for m in matches if m[3] in by_id and by_id[m[3]]["p05"] is not None]
+    errors = log_errors(
+        [m[4] for m in ranged],
+        [by_id[m[3]]["p05"] for m in ranged],
+        [by_id[m[3]]["p95"] for m in ranged],
+    )
+    outcomes = np.clip(1 - errors, 0, 1).tolist()
+
+    questions, users = state["questions"], state["users"]
+    played = {}
+    for (created_at, rid, user, qid, _), s in zip(ranged, outcomes):
+        if math.isnan(s):
+            continue
+        key = str(qid)
+        if key not in questions:
+            questions[key] = state["seeds"].setdefault(key, float(by_id[qid]["elo"] or BASE_RATING))
+        r_user = users.get(user, BASE_RATING) if user != ANONYMOUS else BASE_RATING
+        expected = 1 / (1 + 10 ** ((questions[key] - r_user) / 400))
+        questions[key] -= K_QUESTION * (s - expected)
+        if user != ANONYMOUS:
+            users[user] = r_user + K_USER * (s - expected)
+        played[qid] = played.get(qid, 0) + 1
+
+    if matches:
+        state["watermark"] = list(matches[-1][:2])
+    state["matches"] += sum(played.values())
+    return played
+
+
+def write_elo(state: dict, played: dict[int, int]):
+    bank = QuestionBank()
+    for qid in played:
+        bank.stage("questions", qid, elo=round(state["questions"][str(qid)]))
+    bank.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate question elo from responses.")
+    parser.add_argument("--reset", action="store_true", help="ignore the saved state and replay every response")
+    parser.add_argument("--dry-run", action="store_true", help="print the new ratings without saving anything")
+    parser.add_argument("--backups", type=Path, default=BACKUPS, help="backups directory (default backups/)")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
+
+    start = time.monotonic()
+    bank = load_bank()
+    state = load_state(args.reset)
+    with profiling.timer("read responses"):
+        matches = new_matches(bank, args.backups, state["watermark"])
+    with profiling.timer("replay"):
+        played = replay(state, bank, matches)
+    print(f"Replayed {sum(played.values())} of {len(matches)} new responses over {len(played)} questions "
+          f"in {time.monotonic() - start:.2f}s ({state['matches']} in total)")
+
+    for qid in sorted(played, key=lambda q: -state["questions"][str(q)])[:10]:
+        print(f"  id={qid}: elo {state['questions'][str(qid)]:.0f} ({played[qid]} new)")
+    if args.dry_run:
+        return
+    if played:
+        write_elo(state, played)
+        print("✅ elo written to questions.xlsx; run compile_questions.py to refresh questions.json")
+    save_state(state)
+
+
+if __name__ == "__main__":
+    main()
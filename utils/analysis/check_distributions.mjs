@@ -0,0 +1,14 @@
+// Run before `vite build` (npm prebuild). Only warns: without a recent public/distributions.json
+// the results screen still works, but downloads every raw response of the question.
+import { readFileSync, existsSync } from 'node:fs'
+
+const STALE_DAYS = 14
+const path = new URL('../../public/distributions.json', import.meta.url)
+const fix = 'publish it with `python scripts/db_backup.py && python utils/analysis/build_distributions.py` and commit it'
+
+if (!existsSync(path)) {
+  console.warn(`⚠ public/distributions.json is missing: ${fix}`)
+} else {
+  const age = (Date.now() - Date.parse(JSON.parse(readFileSync(path, 'utf8')).generated_at)) / 86400e3
+  if (!(age < STALE_DAYS)) console.warn(`⚠ public/distributions.json is ${Math.floor(age)} days old: ${fix}`)
+}
@@ -0,0 +1,58 @@
+"""Read table exports written by scripts/db_backup.py.
+
+A table is read from the incremental chain in backups/incremental.json when
+there is one (a compacted snapshot plus the deltas since, or the base plus
+its deltas), otherwise from the newest backups/<timestamp>/ directory that
+has it. Plain, gzip and zstd CSVs are all accepted.
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Iterator
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import profiling
+
+ROOT = Path(__file__).resolve().parents[2]
+BACKUPS = ROOT / "backups"
+STATE_PATH = BACKUPS / "incremental.json"
+SUFFIXES = (".csv", ".csv.gz", ".csv.zst")
+
+
+def open_export(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def table_files(table: str, backups: Path = BACKUPS) -> list[Path]:
+    """Export files that together hold every row of table, oldest first."""
+    state_path = backups / STATE_PATH.name
+    if state_path.exists():
+        mark = json.loads(state_path.read_text()).get("tables", {}).get(table)
+        if mark and mark.get("segments"):
+            return [backups / segment for segment in mark["segments"]]
+
+    for backup_dir in sorted((d for d in backups.glob("*") if d.is_dir()), reverse=True):
+        for suffix in SUFFIXES:
+            path = backup_dir / f"{table}{suffix}"
+            if path.exists():
+                return [path]
+    raise FileNotFoundError(f"No export of '{table}' under {backups}")
+
+
+def read_rows(table: str, backups: Path = BACKUPS) -> Iterator[dict]:
+    for path in table_files(table, backups):
+        profiling.count("export bytes read", path.stat().st_size)
+        n = 0
+        with open_export(path) as raw:
+            for n, row in enumerate(csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8", newline="")), 1):
+                yield row
+        profiling.count(f"export rows {table}", n)
@@ -0,0 +1,111 @@
+# command: `python utils/analysis/score_responses.py [--backups DIR] [--out DIR] [--user USER_ID]`
+"""Score every online and paper response from the latest database exports.
+
+Writes responses_scored.csv (logErr and percentile per response) and
+users_scored.csv (final 0-10 score per user) to --out. Paper answers are
+base_a x 10^exp_b and are ranked against the online population, as the
+results screen does. --user prints one user's breakdown, to compare with what
+the web app shows.
+"""
+
+import argparse
+import csv
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from exports import BACKUPS, read_rows
+import profiling  # on sys.path via exports
+from scoring import question_ranges, score_responses, user_scores
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "question_bank"))
+from compile_questions import load_bank
+
+OUTPUT_DIR = Path(__file__).parent / "output"
+
+
+def num(value: str) -> float:
+    return float(value) if value not in (None, "") else math.nan
+
+
+def load_responses(backups: Path) -> list[dict]:
+    rows = []
+    for r in read_rows("responses_online", backups):
+        rows.append({**r, "source": "online", "answer": num(r["response"])})
+    for r in read_rows("responses_paper", backups):
+        rows.append({**r, "source": "paper", "answer": num(r["base_a"]) * 10 ** num(r["exp_b"])})
+    return rows
+
+
+def fmt(value: float, digits: int = 4) -> str:
+    return "" if math.isnan(value) else f"{value:.{digits}f}"
+
+
+def write_csv(path: Path, fieldnames: list[str], rows):
+    with profiling.timer("write csv"), open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score all responses from database exports.")
+    parser.add_argument("--backups", type=Path, default=BACKUPS, help="backups directory (default backups/)")
+    parser.add_argument("--out", type=Path, default=OUTPUT_DIR, help="output directory")
+    parser.add_argument("--user", help="print the per-question breakdown of one user_id")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
+
+    start = time.monotonic()
+    ranges = question_ranges(load_bank())
+    with profiling.timer("read responses"):
+        rows = load_responses(args.backups)
+    with profiling.timer("score"):
+        errors, percentiles = score_responses(
+            [r["test_model"] for r in rows],
+            [int(r["question_n"]) for r in rows],
+            [r["answer"] for r in rows],
+            [r["source"] == "online" and r["answer"] > 0 for r in rows],
+            ranges,
+        )
+        scores = user_scores([r["user_id"] for r in rows], errors, percentiles)
+    print(f"Scored {len(rows)} responses from {len(scores)} users in {time.monotonic() - start:.2f}s")
+
+    if args.user:
+        for r, err, pct in zip(rows, errors, percentiles):
+            if r["user_id"] == args.user:
+                print(f"  {r['test_model']}{r['question_n']}: answer={r['answer']:g} logErr={fmt(err, 2)} percentile={fmt(pct, 3)}")
+        s = scores.get(args.user)
+        if s:
+            print(f"  score={fmt(s['score'], 1)} avgLogErr={fmt(s['avg_log_err'], 2)}")
+        return
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    sources = {r["user_id"]: (r["source"], r["test_model"]) for r in rows}
+    write_csv(
+        args.out / "responses_scored.csv",
+        ["id", "user_id", "source", "test_model", "question_n", "answer", "log_err", "percentile"],
+        ({**r, "log_err": fmt(err), "percentile": fmt(pct)} for r, err, pct in zip(rows, errors, percentiles)),
+    )
+    write_csv(
+        args.out / "users_scored.csv",
+        ["user_id", "source", "test_model", "score", "avg_log_err", "n_scored"],
+        (
+            {"user_id": u, "source": sources[u][0], "test_model": sources[u][1], "score": fmt(s["score"], 2),
+             "avg_log_err": fmt(s["avg_log_err"]), "n_scored": s["n_scored"]}
+            for u, s in scores.items()
+        ),
+    )
+    valid = np.array([s["score"] for s in scores.values()])
+    valid = valid[~np.isnan(valid)]
+    if len(valid):
+        print(f"  median score {np.median(valid):.1f} over {len(valid)} scored users")
+    print(f"✅ {args.out}/responses_scored.csv, users_scored.csv")
+
+
+if __name__ == "__main__":
+    main()
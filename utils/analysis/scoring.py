@@ -0,0 +1,103 @@
+"""Log-error and percentile scoring, the same rules as src/composables/useTestResults.js.
+
+- logErr = |log10(answer / nearest bound)|, 0 when p05 <= answer <= p95, and
+  undefined (NaN) for answers <= 0 or questions without a range.
+- The population of a (test_model, question_n) is every positive online
+  response to it. The percentile of an answer is the share of the population
+  with a strictly larger logErr, and exactly 1 when the answer is in range.
+- The final 0-10 score is 10 x the mean percentile over the scored questions.
+
+Each population is sorted once, so every percentile is one searchsorted
+(O(log n)) instead of a pass over the population per answer.
+"""
+
+import numpy as np
+
+
+def log_errors(answers, p05, p95) -> np.ndarray:
+    answers = np.asarray(answers, dtype=float)
+    p05 = np.broadcast_to(np.asarray(p05, dtype=float), answers.shape)
+    p95 = np.broadcast_to(np.asarray(p95, dtype=float), answers.shape)
+    errors = np.full(answers.shape, np.nan)
+    ok = (answers > 0) & (p05 > 0) & (p95 > 0)
+    bound = np.where(answers < p05, p05, p95)
+    errors[ok] = np.abs(np.log10(answers[ok] / bound[ok]))
+    errors[ok & (answers >= p05) & (answers <= p95)] = 0.0
+    return errors
+
+
+class Population:
+    """Sorted logErrs of one question's online answers."""
+
+    def __init__(self, answers, p05: float, p95: float):
+        errors = log_errors(answers, p05, p95)
+        self.errors = np.sort(errors[~np.isnan(errors)])
+
+    def __len__(self):
+        return len(self.errors)
+
+    def percentile(self, errors) -> np.ndarray:
+        errors = np.asarray(errors, dtype=float)
+        n = len(self.errors)
+        result = np.full(errors.shape, np.nan)
+        if n:
+            larger = n - np.searchsorted(self.errors, errors, side="right")
+            result = np.where(np.isnan(errors), np.nan, larger / n)
+        return np.where(errors == 0, 1.0, result)
+
+
+def question_ranges(bank: dict) -> dict[tuple[str, int], tuple[float, float]]:
+    """(test_model, question_n) -> (p05, p95) from the compiled question bank."""
+    by_id = {q["id"]: q for q in bank["questions"]}
+    ranges = {}
+    for model, ids in bank["tests"].items():
+        for n, qid in enumerate(ids, 1):
+            q = by_id[qid]
+            if q["p05"] is not None and q["p95"] is not None:
+                ranges[(model, n)] = (q["p05"], q["p95"])
+    return ranges
+
+
+def score_responses(models, question_ns, answers, population_mask, ranges) -> tuple[np.ndarray, np.ndarray]:
+    """logErr and percentile of every response.
+
+    models, question_ns and answers are parallel arrays over all responses;
+    population_mask marks the ones that count as population (online answers).
+    Responses to questions missing from ranges get NaN for both.
+    """
+    models = np.asarray(models)
+    question_ns = np.asarray(question_ns, dtype=int)
+    answers = np.asarray(answers, dtype=float)
+    population_mask = np.asarray(population_mask, dtype=bool)
+    errors = np.full(answers.shape, np.nan)
+    percentiles = np.full(answers.shape, np.nan)
+
+    keys = np.char.add(np.char.add(models.astype(str), ":"), question_ns.astype(str))
+    for key in np.unique(keys):
+        model, n = key.split(":")
+        if (model, int(n)) not in ranges:
+            continue
+        p05, p95 = ranges[(model, int(n))]
+        idx = np.flatnonzero(keys == key)
+        errors[idx] = log_errors(answers[idx], p05, p95)
+        population = Population(answers[idx[population_mask[idx]]], p05, p95)
+        percentiles[idx] = population.percentile(errors[idx])
+    return errors, percentiles
+
+
+def user_scores(user_ids, errors, percentiles) -> dict[str, dict]:
+    """Per user: final 0-10 score, mean logErr and number of scored questions."""
+    users, inverse = np.unique(np.asarray(user_ids).astype(str), return_inverse=True)
+    scored = ~np.isnan(percentiles)
+    answered = ~np.isnan(errors)
+    n_scored = np.bincount(inverse, weights=scored, minlength=len(users))
+    n_answered = np.bincount(inverse, weights=answered, minlength=len(users))
+    pct_sum = np.bincount(inverse, weights=np.where(scored, percentiles, 0), minlength=len(users))
+    err_sum = np.bincount(inverse, weights=np.where(answered, errors, 0), minlength=len(users))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(n_scored > 0, pct_sum / n_scored * 10, np.nan)
+        avg_err = np.where(n_answered > 0, err_sum / n_answered, np.nan)
+    return {
+        u: {"score": score[i], "avg_log_err": avg_err[i], "n_scored": int(n_scored[i])}
+        for i, u in enumerate(users)
+    }
@@ -0,0 +1,200 @@
+"""Solve many questions through a batch job instead of one call per question.
+
+Usage: python batch.py 1-200 [--local] [--poll 60] [--job batches/123]
+
+Prompts are rendered with load_prompt() into a JSONL file, submitted as one
+batch job, polled until it finishes, and the results are merged into the
+`questions` and `questions_solutions_llm_comment` sheets. Parsed responses are
+also stored in the response cache, so a later orchestrator run over the same
+ids is free. --local runs the job in-process with a fake backend and writes
+to a scratch copy of the workbook instead.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Protocol
+
+from orchestrator import SOLUTION_SHEETS, apply_results, parse_ids
+from solve import MODEL, RESPONSE_SCHEMA, InvalidResponse, get_cache, get_client, load_prompt, parse_response, record_usage
+import profiling  # on sys.path via solve
+from cache import cache_key
+from workbook import EXCEL_PATH, QuestionBank
+
+BATCH_DIR = Path(__file__).parent / ".cache" / "batches"
+DONE_STATES = {"succeeded", "failed", "cancelled", "expired"}
+
+
+class BatchBackend(Protocol):
+    def submit(self, jsonl_path: Path) -> str: ...
+
+    def state(self, job: str) -> str: ...
+
+    def results(self, job: str) -> Iterator[tuple[str, str | None, str | None]]:
+        """Yield (key, response text, error) per request."""
+        ...
+
+
+class GeminiBatchBackend:
+    def __init__(self, model: str = MODEL):
+        self.model = model
+        self.client = get_client()
+
+    def submit(self, jsonl_path: Path) -> str:
+        from google.genai import types
+
+        with profiling.timer("gemini batch upload"):
+            uploaded = self.client.files.upload(
+                file=str(jsonl_path),
+                config=types.UploadFileConfig(display_name=jsonl_path.stem, mime_type="jsonl"),
+            )
+        profiling.count("gemini bytes out", jsonl_path.stat().st_size)
+        job = self.client.batches.create(model=self.model, src=uploaded.name, config={"display_name": jsonl_path.stem})
+        return job.name
+
+    def state(self, job: str) -> str:
+        name = self.client.batches.get(name=job).state.name
+        return name.removeprefix("JOB_STATE_").lower()
+
+    def results(self, job: str):
+        batch_job = self.client.batches.get(name=job)
+        with profiling.timer("gemini batch download"):
+            content = self.client.files.download(file=batch_job.dest.file_name)
+        profiling.count("gemini bytes in", len(content))
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "response" not in item:
+                yield item["key"], None, json.dumps(item.get("error", "no response"))
+                continue
+            record_usage(item["response"].get("usageMetadata"))
+            parts = item["response"]["candidates"][0]["content"]["parts"]
+            yield item["key"], "".join(p.get("text", "") for p in parts), None
+
+
+def fake_response(prompt: str) -> str:
+    return json.dumps({"p05": 1, "p95": 10, "comments": "local fake backend"})
+
+
+class LocalBatchBackend:
+    """In-process stand-in for the remote batch service, for tests and dry runs."""
+
+    def __init__(self, responder: Callable[[str], str] = fake_response):
+        self.responder = responder
+        self.jobs = {}
+
+    def submit(self, jsonl_path: Path) -> str:
+        job = f"local/{jsonl_path.stem}"
+        self.jobs[job] = jsonl_path
+        return job
+
+    def state(self, job: str) -> str:
+        return "succeeded"
+
+    def results(self, job: str):
+        with open(self.jobs[job], encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                prompt = item["request"]["contents"][0]["parts"][0]["text"]
+                try:
+                    yield item["key"], self.responder(prompt), None
+                except Exception as e:
+                    yield item["key"], None, str(e)
+
+
+def build_requests(questions: list[dict], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for q in questions:
+            request = {
+                "contents": [{"role": "user", "parts": [{"text": load_prompt(q["text"])}]}],
+                "generationConfig": {"responseMimeType": "application/json", "responseSchema": RESPONSE_SCHEMA},
+            }
+            f.write(json.dumps({"key": str(q["id"]), "request": request}, ensure_ascii=False) + "\n")
+    return path
+
+
+def wait(backend: BatchBackend, job: str, poll: float) -> str:
+    start = time.monotonic()
+    while (state := backend.state(job)) not in DONE_STATES:
+        print(f"  {job}: {state} ({time.monotonic() - start:.0f}s)")
+        time.sleep(poll)
+    return state
+
+
+def run_batch(
+    ids: set[int],
+    backend: BatchBackend,
+    poll: float = 60,
+    job: str | None = None,
+    out_path: Path = EXCEL_PATH,
+    cache_results: bool = True,
+):
+    bank = QuestionBank(EXCEL_PATH, sheets=SOLUTION_SHEETS)
+    questions = bank.questions(ids)
+    index = {str(q["id"]): i for i, q in enumerate(questions)}
+
+    if job is None:
+        path = build_requests(questions, BATCH_DIR / f"{datetime.now():%Y-%m-%d_%H%M%S}.jsonl")
+        job = backend.submit(path)
+        print(f"Submitted {len(questions)} prompts as {job} ({path.name})")
+
+    with profiling.timer("batch wait"):
+        state = wait(backend, job, poll)
+    if state != "succeeded":
+        print(f"Batch {job} ended as {state}; nothing merged.")
+        return
+
+    cache = get_cache() if cache_results else None
+    results = {}
+    for key, text, error in backend.results(job):
+        if key not in index:
+            continue
+        i = index[key]
+        try:
+            if error:
+                raise RuntimeError(error)
+            results[i] = parse_response(text)
+            if cache:
+                cache.put(cache_key(MODEL, load_prompt(questions[i]["text"])), MODEL, text)
+        except Exception as e:
+            results[i] = e
+            print(f"  id={key}: ERROR: {e}")
+
+    failed = apply_results(bank, questions, results)
+    if failed:
+        print(f"\n{len(failed)} failed: {failed}")
+    invalid = sum(isinstance(r, InvalidResponse) for r in results.values())
+    print(f"Invalid responses: {invalid}/{len(results)} ({invalid / max(1, len(results)):.1%})")
+    if failed:
+        print(f"Retry just those with: python orchestrator.py {' '.join(map(str, failed))}")
+    bank.save(out_path)
+    print(f"\nDone. Saved to {out_path}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Solve questions through one batch job.")
+    parser.add_argument("ids", nargs="+", help="question ids or ranges like 12-32")
+    parser.add_argument("--local", action="store_true", help="use the in-process fake backend")
+    parser.add_argument("--poll", type=float, default=60, help="seconds between status checks (default 60)")
+    parser.add_argument("--job", help="resume polling an already submitted job instead of submitting")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.start(args)
+    if args.local:
+        run_batch(
+            parse_ids(args.ids),
+            LocalBatchBackend(),
+            poll=args.poll,
+            out_path=BATCH_DIR / "questions_local.xlsx",
+            cache_results=False,
+        )
+    else:
+        run_batch(parse_ids(args.ids), GeminiBatchBackend(), poll=args.poll, job=args.job)
@@ -0,0 +1,58 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_PATH = Path(__file__).parent / ".cache" / "responses.sqlite"
+MAX_ENTRIES = 5000
+MAX_AGE_DAYS = 90
+
+
+def cache_key(model: str, prompt: str, sample: int = 0) -> str:
+    raw = f"{model}\0{prompt}" + (f"\0sample={sample}" if sample else "")
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """On-disk LLM response cache keyed by hash(model, rendered prompt).
+
+    Entries older than max_age_days are dropped and, above max_entries, the
+    least recently used ones go first. Pruning runs once when the cache opens.
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_entries: int = MAX_ENTRIES, max_age_days: float = MAX_AGE_DAYS):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, accessed REAL)"
+        )
+        self.prune(max_entries, max_age_days)
+
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                self.db.commit()
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, response, now, now)
+            )
+            self.db.commit()
+
+    def prune(self, max_entries: int, max_age_days: float):
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - max_age_days * 86400,))
+            self.db.execute(
+                "DELETE FROM responses WHERE key NOT IN"
+                " (SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                (max_entries,),
+            )
+            self.db.commit()
@@ -0,0 +1,75 @@
+import math
+
+AGGREGATORS = ("geomedian", "pool")
+
+
+def geometric_median(points: list[tuple[float, float]], iters: int = 100, eps: float = 1e-9) -> tuple[float, float]:
+    """Weiszfeld's algorithm: the 2-D point minimizing the sum of distances."""
+    x = sum(p[0] for p in points) / len(points)
+    y = sum(p[1] for p in points) / len(points)
+    for _ in range(iters):
+        num_x = num_y = den = 0.0
+        for px, py in points:
+            d = math.hypot(px - x, py - y)
+            if d < eps:
+                continue
+            num_x += px / d
+            num_y += py / d
+            den += 1 / d
+        if den == 0:
+            break
+        nx, ny = num_x / den, num_y / den
+        if math.hypot(nx - x, ny - y) < eps:
+            return nx, ny
+        x, y = nx, ny
+    return x, y
+
+
+def median(values: list[float]) -> float:
+    s = sorted(values)
+    mid = len(s) // 2
+    return s[mid] if len(s) % 2 else (s[mid - 1] + s[mid]) / 2
+
+
+def aggregate(samples: list[dict], method: str = "geomedian") -> dict:
+    """Combine sampled (p05, p95) bounds in log10 space.
+
+    geomedian: geometric median of the (log p05, log p95) points, robust to a
+    stray sample. pool: median of each bound on its own. `dispersion` is the
+    standard deviation, in orders of magnitude, of the samples' geometric
+    centers sqrt(p05 * p95).
+    """
+    valid = [s for s in samples if s.get("p05") and s.get("p95") and s["p05"] > 0 and s["p95"] > 0]
+    if not valid:
+        raise ValueError("No valid samples to aggregate")
+    points = [(math.log10(s["p05"]), math.log10(s["p95"])) for s in valid]
+
+    if method == "geomedian":
+        lo, hi = geometric_median(points)
+    elif method == "pool":
+        lo, hi = median([p[0] for p in points]), median([p[1] for p in points])
+    else:
+        raise ValueError(f"Unknown aggregator '{method}', expected one of {AGGREGATORS}")
+
+    centers = [(a + b) / 2 for a, b in points]
+    mean = sum(centers) / len(centers)
+    dispersion = math.sqrt(sum((c - mean) ** 2 for c in centers) / len(centers))
+
+    # Keep the reasoning of the sample closest to the aggregate.
+    closest = min(range(len(points)), key=lambda i: math.hypot(points[i][0] - lo, points[i][1] - hi))
+    # The ratio is taken from the rounded bounds, so it matches what is stored.
+    p05, p95 = float(f"{10 ** lo:.3g}"), float(f"{10 ** hi:.3g}")
+    return {
+        "p05": p05,
+        "p95": p95,
+        "q_p05_p95": round(p95 / p05, 2),
+        "dispersion": round(dispersion, 3),
+        "n_samples": len(valid),
+        "comments": valid[closest].get("comments", ""),
+    }
+
+
+def sample_plan(k: int, models: list[str]) -> list[tuple[str, int]]:
+    """k draws spread round-robin over the models, each with its own sample index."""
+    return [(models[i % len(models)], i // len(models)) for i in range(k)]
+
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+JOURNAL_PATH = Path(__file__).parent / ".cache" / "orchestrator.jsonl"
+
+
+class Journal:
+    """Append-only JSONL of finished LLM calls, one line per (question id, model, sample).
+
+    Each line is flushed and fsynced as soon as its call finishes, so an
+    interrupted run loses at most the calls still in flight. A torn last line
+    (crash mid-write) is ignored on load. Without resume a non-empty previous
+    journal is renamed to <name>.<mtime>.jsonl rather than overwritten, as it
+    may be the only record of calls already paid for.
+    """
+
+    def __init__(self, path: Path = JOURNAL_PATH, resume: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        if not resume and path.exists() and path.stat().st_size:
+            stamp = time.strftime("%Y-%m-%d_%H%M%S", time.localtime(path.stat().st_mtime))
+            old = path.with_name(f"{path.stem}.{stamp}{path.suffix}")
+            os.replace(path, old)
+            print(f"Previous journal kept as {old.name} (use --resume to continue a run)")
+        self.entries = self.load(path) if resume else {}
+        self.lock = threading.Lock()
+        self.f = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self.f.tell() and not path.read_bytes().endswith(b"\n"):
+            self.f.write("\n")  # close off a torn line so the next append starts clean
+
+    @staticmethod
+    def load(path: Path) -> dict[tuple[int, str, int], dict]:
+        entries = {}
+        if not path.exists():
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[(item["id"], item["model"], item["sample"])] = item["result"]
+        return entries
+
+    def append(self, qid: int, model: str, sample: int, result: dict):
+        line = json.dumps({"id": qid, "model": model, "sample": sample, "result": result, "at": time.time()})
+        with self.lock:
+            self.f.write(line + "\n")
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.entries[(qid, model, sample)] = result
+
+    def close(self):
+        self.f.close()
@@ -1,82 +1,112 @@
-import json
-import sys
-import time
-from pathlib import Path
+import argparse
 
-import openpyxl
-from solve import solve
+from ensemble import AGGREGATORS, aggregate, sample_plan
+from journal import JOURNAL_PATH, Journal
+from scheduler import run_with_retries
+from solve import MODEL, failure_report, solve
+from workbook import EXCEL_PATH, QuestionBank
+import profiling  # on sys.path via solve
 
-EXCEL_PATH = Path(__file__).resolve().parents[2] / "public" / "questions.xlsx"
+SOLUTION_SHEETS = ("questions", "questions_solutions_llm_comment")
 
 
-def col_index(ws, name: str) -> int:
-    for c in range(1, ws.max_column + 1):
-        if ws.cell(1, c).value == name:
-            return c
-    raise ValueError(f"Column '{name}' not found")
-
-
-def load_questions(ws, ids: set[int]) -> list[dict]:
-    c_id = col_index(ws, "id_question")
-    c_q = col_index(ws, "question")
-    questions = []
-    for row in range(2, ws.max_row + 1):
-        qid = ws.cell(row, c_id).value
-        text = ws.cell(row, c_q).value
-        if qid is None or not text:
+def apply_results(bank: QuestionBank, questions: list[dict], results: dict) -> list[int]:
+    """Stage {question index: result dict or Exception} in the bank; return failed ids."""
+    failed = []
+    for i, q in enumerate(questions):
+        result = results.get(i)
+        if result is None or isinstance(result, Exception):
+            failed.append(q["id"])
             continue
-        if int(qid) in ids:
-            questions.append({"row": row, "id": int(qid), "text": text})
-    return sorted(questions, key=lambda q: q["id"])
-
-
-def find_comment_row(ws_c, qid: int) -> int:
-    c_id = col_index(ws_c, "id_question")
-    for row in range(2, ws_c.max_row + 2):
-        val = ws_c.cell(row, c_id).value
-        if val is not None and int(val) == qid:
-            return row
-        if val is None:
-            return row
-    return ws_c.max_row + 1
-
-
-def run(ids: set[int]):
-    wb = openpyxl.load_workbook(EXCEL_PATH)
-    ws_q = wb["questions"]
-    ws_c = wb["questions_solutions_llm_comment"]
-
-    c_p05 = col_index(ws_q, "p05")
-    c_p95 = col_index(ws_q, "p95")
-    c_ratio = col_index(ws_q, "q_p05_p95")
-    c_cid = col_index(ws_c, "id_question")
-    c_comment = col_index(ws_c, "llm_comment")
-
-    questions = load_questions(ws_q, ids)
-    print(f"Solving {len(questions)} questions (ids: {sorted(ids)})...\n")
-
-    for i, q in enumerate(questions, 1):
-        print(f"[{i}/{len(questions)}] id={q['id']}: {q['text'][:80]}...")
+        print(f"  id={q['id']} -> p05={result['p05']}, p95={result['p95']}, q={result['q_p05_p95']}")
+
+        values = {"p05": result["p05"], "p95": result["p95"], "q_p05_p95": result["q_p05_p95"]}
+        if "dispersion" in result:
+            values["dispersion"] = result["dispersion"]
+        bank.stage("questions", q["id"], **values)
+        bank.stage("questions_solutions_llm_comment", q["id"], llm_comment=result.get("comments", ""))
+    return failed
+
+
+def solve_journaled(questions: list[dict], plan: list[tuple[str, int]], refresh: bool, journal: Journal, **kw) -> dict:
+    """Run every (question, model, sample) call not already in the journal, journaling each as it finishes.
+
+    Returns {question index: [results]}, journaled ones included.
+    """
+    by_question = {i: [] for i in range(len(questions))}
+    tasks = []
+    for i, q in enumerate(questions):
+        for model, sample in plan:
+            done = journal.entries.get((q["id"], model, sample))
+            if done is None:
+                tasks.append((i, q, model, sample))
+            else:
+                by_question[i].append(done)
+    skipped = len(questions) * len(plan) - len(tasks)
+    if skipped:
+        print(f"Resuming: {skipped} calls already in {journal.path.name}, {len(tasks)} to go\n")
+
+    raw = run_with_retries(
+        lambda t: solve(t[1]["text"], refresh, t[2], t[3]),
+        tasks,
+        label=lambda t: f"id={t[1]['id']} {t[2]}#{t[3]}",
+        on_result=lambda t, result: journal.append(t[1]["id"], t[2], t[3], result),
+        **kw,
+    )
+    for n, t in enumerate(tasks):
+        if not isinstance(raw[n], Exception):
+            by_question[t[0]].append(raw[n])
+    return by_question
+
+
+def solve_ensembles(questions: list[dict], k: int, models: list[str], method: str, refresh: bool, **kw) -> dict:
+    """Draw k samples per question as one flat pool of calls, then aggregate per question."""
+    by_question = solve_journaled(questions, sample_plan(k, models), refresh, **kw)
+
+    results = {}
+    for i, samples in by_question.items():
         try:
-            result = solve(q["text"])
-            print(f"  -> p05={result['p05']}, p95={result['p95']}, q={result['q_p05_p95']}")
-
-            ws_q.cell(q["row"], c_p05, result["p05"])
-            ws_q.cell(q["row"], c_p95, result["p95"])
-            ws_q.cell(q["row"], c_ratio, result["q_p05_p95"])
-
-            crow = find_comment_row(ws_c, q["id"])
-            ws_c.cell(crow, c_cid, q["id"])
-            ws_c.cell(crow, c_comment, result.get("comments", ""))
-
-        except Exception as e:
-            print(f"  ERROR: {e}")
-            continue
-
-        if i < len(questions):
-            time.sleep(1)
-
-    wb.save(EXCEL_PATH)
+            results[i] = aggregate(samples, method)
+        except ValueError as e:
+            results[i] = e
+    return results
+
+
+def run(
+    ids: set[int],
+    workers: int = 4,
+    rpm: float | None = None,
+    refresh: bool = False,
+    ensemble: int = 1,
+    models: list[str] | None = None,
+    method: str = "geomedian",
+    retries: int = 2,
+    resume: bool = False,
+):
+    bank = QuestionBank(EXCEL_PATH, sheets=SOLUTION_SHEETS)
+    questions = bank.questions(ids)
+    print(f"Solving {len(questions)} questions (ids: {sorted(ids)}, workers={workers}, rpm={rpm or '∞'})...\n")
+
+    # Every finished call is journaled at once, so a crash or Ctrl-C loses nothing already paid for.
+    journal = Journal(JOURNAL_PATH, resume=resume)
+    kw = {"journal": journal, "workers": workers, "rpm": rpm, "retries": retries}
+    try:
+        if ensemble > 1:
+            results = solve_ensembles(questions, ensemble, models or [MODEL], method, refresh, **kw)
+        else:
+            by_question = solve_journaled(questions, [(MODEL, 0)], refresh, **kw)
+            results = {i: samples[0] if samples else None for i, samples in by_question.items()}
+    finally:
+        journal.close()
+
+    # Workbook writes stay on this thread and happen in one pass after every call is back;
+    # the save goes through a temp file, so questions.xlsx is never left half-written.
+    failed = apply_results(bank, questions, results)
+    if failed:
+        print(f"\n{len(failed)} failed: {failed} (rerun with --resume to retry only these)")
+    print(failure_report())
+    with profiling.timer("workbook save"):
+        bank.save()
     print(f"\nDone. Saved to {EXCEL_PATH}")
 
 
@@ -91,9 +121,38 @@ def parse_ids(args: list[str]) -> set[int]:
     return ids
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Solve questions with the LLM and write p05/p95 to questions.xlsx.",
+        epilog="Example: python orchestrator.py 1 2 3   or   python orchestrator.py 12-32 --workers 8",
+    )
+    parser.add_argument("ids", nargs="+", help="question ids or ranges like 12-32")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent LLM calls (default 4)")
+    parser.add_argument("--rpm", type=float, help="max requests per minute (token bucket)")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached responses and call the model again")
+    parser.add_argument("--ensemble", type=int, default=1, metavar="K", help="samples per question (default 1)")
+    parser.add_argument("--models", help=f"comma-separated models for ensemble samples (default {MODEL})")
+    parser.add_argument("--aggregate", choices=AGGREGATORS, default="geomedian", help="how to combine samples")
+    parser.add_argument("--retries", type=int, default=2, help="extra rounds for failed calls only (default 2)")
+    parser.add_argument("--resume", action="store_true", help="skip calls already in the journal of the last run")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    if args.models and args.ensemble < 2:
+        parser.error("--models needs --ensemble K with K > 1")
+    return args
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python orchestrator.py 1 2 3   or   python orchestrator.py 12-32")
-        sys.exit(1)
-    ids = parse_ids(sys.argv[1:])
-    run(ids)
+    args = parse_args()
+    profiling.start(args)
+    run(
+        parse_ids(args.ids),
+        workers=args.workers,
+        rpm=args.rpm,
+        refresh=args.refresh,
+        ensemble=args.ensemble,
+        models=args.models.split(",") if args.models else None,
+        method=args.aggregate,
+        retries=args.retries,
+        resume=args.resume,
+    )
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+RETRY_CODES = {429, 500, 503}
+
+
+class TokenBucket:
+    """Thread-safe limiter: at most `rate` calls per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_quota_error(exc: Exception) -> bool:
+    code = getattr(exc, "code", None)
+    return code in RETRY_CODES or "RESOURCE_EXHAUSTED" in str(exc)
+
+
+def with_backoff(fn, *args, retries: int = 5, base: float = 2.0, max_delay: float = 60.0, limiter=None):
+    """Call fn, retrying quota/overload errors with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries or not is_quota_error(e):
+                raise
+            delay = min(max_delay, base ** attempt) * random.uniform(0.5, 1.5)
+            print(f"  quota/overload ({getattr(e, 'code', '?')}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def run_concurrent(fn, items: list, workers: int = 4, rpm: float | None = None, label=str, on_result=None) -> dict:
+    """Run fn(item) over items with bounded concurrency and an optional rate limit.
+
+    Returns {item_index: result or Exception}. Progress is printed as calls finish,
+    and on_result(item, result) is called on this thread for each success.
+    """
+    limiter = TokenBucket(rpm / 60, burst=max(1, workers)) if rpm else None
+    results = {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(with_backoff, fn, item, limiter=limiter): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+                status = "ok"
+            except Exception as e:
+                results[i] = e
+                status = f"ERROR: {e}"
+            if on_result and status == "ok":
+                on_result(items[i], results[i])
+            elapsed = time.monotonic() - start
+            print(f"[{done}/{len(items)}] {label(items[i])}: {status} ({elapsed:.1f}s)")
+    return results
+
+
+def run_with_retries(fn, items: list, retries: int = 2, label=str, **kw) -> dict:
+    """run_concurrent, then run again only the items that failed, up to `retries` more rounds."""
+    results = run_concurrent(fn, items, label=label, **kw)
+    for round_ in range(1, retries + 1):
+        failed = [i for i, r in results.items() if isinstance(r, Exception)]
+        if not failed:
+            break
+        print(f"\nRetrying {len(failed)} failed calls (round {round_}/{retries})...")
+        again = run_concurrent(fn, [items[i] for i in failed], label=label, **kw)
+        for j, i in enumerate(failed):
+            results[i] = again[j]
+    return results
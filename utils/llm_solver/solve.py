@@ -1,42 +1,187 @@
+import argparse
 import json
 import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 from google import genai
 
+from cache import ResponseCache, cache_key
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import profiling
+
 load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 
 PROMPT_FILE = Path(__file__).parent / "prompt_llm_solve_question.md"
 MODEL = "gemini-3-pro-preview"
+REPAIRS = 1
+
+# JSON mode: the model must answer with exactly this object.
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "p05": {"type": "NUMBER"},
+        "p95": {"type": "NUMBER"},
+        "comments": {"type": "STRING"},
+    },
+    "required": ["p05", "p95", "comments"],
+    "propertyOrdering": ["p05", "p95", "comments"],
+}
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+REPAIR_PROMPT = (
+    "Tu respuesta anterior no es válida: {error}. Responde solo con el objeto JSON "
+    '{{"p05": número > 0, "p95": número > p05, "comments": texto}}.'
+)
+
+# usage_metadata field (SDK object), its batch-output JSON name, and the profiling counter
+TOKEN_FIELDS = [
+    ("prompt_token_count", "promptTokenCount", "gemini tokens in"),
+    ("candidates_token_count", "candidatesTokenCount", "gemini tokens out"),
+    ("thoughts_token_count", "thoughtsTokenCount", "gemini tokens thinking"),
+]
+
+_client = None
+_lock = threading.Lock()
+_cache = None
+stats = {"responses": 0, "invalid": 0, "repaired": 0}
+
+
+class InvalidResponse(ValueError):
+    pass
+
+
+def get_client() -> genai.Client:
+    global _client
+    with _lock:
+        if _client is None:
+            _client = genai.Client()
+    return _client
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResponseCache()
+    return _cache
+
+
+@lru_cache(maxsize=1)
+def load_template() -> str:
+    return PROMPT_FILE.read_text(encoding="utf-8")
 
 
 def load_prompt(question: str) -> str:
-    template = PROMPT_FILE.read_text(encoding="utf-8")
-    return template.replace("[PEGA AQUÍ TU PREGUNTA]", question)
+    return load_template().replace("[PEGA AQUÍ TU PREGUNTA]", question)
 
 
-def solve(question: str) -> dict:
-    client = genai.Client()
-    prompt = load_prompt(question)
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
-    response = client.models.generate_content(
-        model=MODEL,
-        contents=prompt,
-    )
 
-    text = "".join(p.text for p in response.candidates[0].content.parts if p.text).strip()
+def parse_response(text: str) -> dict:
+    """Parse and validate a {p05, p95, comments} answer; raise InvalidResponse otherwise."""
+    text = text.strip()
     if text.startswith("```"):
-        text = text.split("\n", 1)[1]
+        text = text.split("\n", 1)[-1]
         text = text.rsplit("```", 1)[0].strip()
 
-    data = json.loads(text)
-    data["q_p05_p95"] = round(data["p95"] / data["p05"], 2) if data["p05"] else None
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise InvalidResponse(f"not JSON ({e.msg})") from e
+    if not isinstance(data, dict):
+        raise InvalidResponse("not a JSON object")
+    p05, p95 = data.get("p05"), data.get("p95")
+    if not is_number(p05) or not is_number(p95):
+        raise InvalidResponse(f"p05 and p95 must be numbers, got {p05!r}, {p95!r}")
+    if not 0 < p05 < p95:
+        raise InvalidResponse(f"need 0 < p05 < p95, got {p05}, {p95}")
+    if not isinstance(data.get("comments"), str):
+        raise InvalidResponse("comments must be a string")
+    data["q_p05_p95"] = round(p95 / p05, 2)
     return data
 
 
+def record(**counts):
+    with _lock:
+        for name, n in counts.items():
+            stats[name] += n
+
+
+def record_usage(usage):
+    """Count the tokens of one response, from the SDK's usage_metadata or a batch result's usageMetadata."""
+    if not usage:
+        return
+    for field, key, counter in TOKEN_FIELDS:
+        n = usage.get(key) if isinstance(usage, dict) else getattr(usage, field, None)
+        profiling.count(counter, n or 0)
+
+
+def response_text(response) -> str:
+    return "".join(p.text for p in response.candidates[0].content.parts if p.text).strip()
+
+
+def solve(question: str, refresh: bool = False, model: str = MODEL, sample: int = 0, repairs: int = REPAIRS) -> dict:
+    """Solve one question; `sample` > 0 keys an independent draw for ensembles.
+
+    The model answers in JSON mode against RESPONSE_SCHEMA. An answer that still
+    breaks the contract is sent back once per repair with the validation error,
+    in the same conversation; only valid answers are cached.
+    """
+    prompt = load_prompt(question)
+    key = cache_key(model, prompt, sample)
+    cache = get_cache()
+
+    text = None if refresh else cache.get(key)
+    if text is not None:
+        try:
+            data = parse_response(text)
+            profiling.count("llm cache hits")
+            return data
+        except InvalidResponse:
+            pass  # cached before validation existed; ask again
+    profiling.count("llm cache misses")
+
+    contents = [{"role": "user", "parts": [{"text": prompt}]}]
+    for attempt in range(repairs + 1):
+        with profiling.timer(f"gemini {model}"):
+            response = get_client().models.generate_content(model=model, contents=contents, config=GENERATION_CONFIG)
+        record_usage(getattr(response, "usage_metadata", None))
+        text = response_text(response)
+        try:
+            data = parse_response(text)
+        except InvalidResponse as e:
+            record(responses=1, invalid=1)
+            if attempt == repairs:
+                raise
+            contents += [
+                {"role": "model", "parts": [{"text": text}]},
+                {"role": "user", "parts": [{"text": REPAIR_PROMPT.format(error=e)}]},
+            ]
+            continue
+        record(responses=1, repaired=int(attempt > 0))
+        cache.put(key, model, text)
+        return data
+
+
+def failure_report() -> str:
+    with _lock:
+        n, bad, fixed = stats["responses"], stats["invalid"], stats["repaired"]
+    rate = f"{bad / n:.1%}" if n else "—"
+    return f"Invalid responses: {bad}/{n} ({rate}), {fixed} repaired"
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve one sample question (smoke test).")
+    parser.add_argument("--refresh", action="store_true", help="ignore the cached response")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
     question = "¿Cuántos granos de arroz hay en el típico paquete de 1kg?"
 
-    result = solve(question)
+    result = solve(question, refresh=args.refresh)
 
     print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,116 @@
+import os
+from pathlib import Path
+
+import openpyxl
+
+EXCEL_PATH = Path(__file__).resolve().parents[2] / "public" / "questions.xlsx"
+
+
+class SheetIndex:
+    """Header and id -> row indexes of one sheet, built from a single pass.
+
+    The header is the first row holding id_column, which is not always row 1
+    (questions_solutions_llm_comment has it below its data); row 1 otherwise.
+    """
+
+    def __init__(self, ws, id_column: str = "id_question"):
+        self.ws = ws
+        rows = list(ws.iter_rows(values_only=True))
+        self.header_row = next((r for r, values in enumerate(rows, 1) if id_column in values), 1)
+        header = rows[self.header_row - 1] if rows else ()
+        # Last column holding any value; ws.max_column also counts formatted empty cells.
+        self.last_column = max((c for values in rows for c, v in enumerate(values, 1) if v is not None), default=0)
+        self.columns = {name: c for c, name in enumerate(header, 1) if name is not None}
+        self.records = []
+        self.row_of = {}
+        self.free_rows = []
+        c_id = self.columns.get(id_column)
+        for r, values in enumerate(rows, 1):
+            if r == self.header_row:
+                continue
+            self.records.append(values)
+            if c_id is None:
+                continue
+            qid = values[c_id - 1] if c_id <= len(values) else None
+            if qid is None:
+                self.free_rows.append(r)
+            else:
+                self.row_of.setdefault(int(qid), r)
+        self.next_row = len(rows) + 1
+
+    def col(self, name: str, create: bool = False) -> int:
+        if name not in self.columns:
+            if not create:
+                raise ValueError(f"Column '{name}' not found in '{self.ws.title}'")
+            # Appended after the last used column: inserting one next to related columns
+            # would shift cells under formulas that openpyxl does not rewrite.
+            self.last_column += 1
+            self.columns[name] = self.last_column
+            self.ws.cell(self.header_row, self.columns[name], name)
+        return self.columns[name]
+
+    def value(self, values: tuple, name: str):
+        c = self.columns[name]
+        return values[c - 1] if c <= len(values) else None
+
+    def row_for(self, qid: int) -> int:
+        """Row holding qid; a new id takes the first blank row, else a new one at the end."""
+        if qid not in self.row_of:
+            if self.free_rows:
+                self.row_of[qid] = self.free_rows.pop(0)
+            else:
+                self.row_of[qid] = self.next_row
+                self.next_row += 1
+        return self.row_of[qid]
+
+
+class QuestionBank:
+    """questions.xlsx read once, with updates staged in memory and written in one pass."""
+
+    def __init__(self, path: Path = EXCEL_PATH, sheets: tuple[str, ...] = ("questions",)):
+        """sheets are indexed now and must have an id_question header, so a malformed
+        workbook fails here rather than at save(), after the work is done."""
+        self.path = path
+        self.wb = openpyxl.load_workbook(path)
+        self._sheets = {}
+        self.staged = {}
+        for name in sheets:
+            if name not in self.wb.sheetnames:
+                raise ValueError(f"Sheet '{name}' not found in {path.name}")
+            self.sheet(name).col("id_question")
+
+    def sheet(self, name: str) -> SheetIndex:
+        if name not in self._sheets:
+            self._sheets[name] = SheetIndex(self.wb[name])
+        return self._sheets[name]
+
+    def questions(self, ids: set[int] | None = None) -> list[dict]:
+        sheet = self.sheet("questions")
+        questions = []
+        for values in sheet.records:
+            qid = sheet.value(values, "id_question")
+            text = sheet.value(values, "question")
+            if qid is None or not text:
+                continue
+            if ids is None or int(qid) in ids:
+                questions.append({"id": int(qid), "text": text})
+        return sorted(questions, key=lambda q: q["id"])
+
+    def stage(self, sheet: str, qid: int, **values):
+        self.staged.setdefault(sheet, {}).setdefault(qid, {}).update(values)
+
+    def save(self, path: Path | None = None):
+        """Apply staged values and write the workbook via a temp file and rename, so a crash
+        mid-write leaves the previous file intact."""
+        for name, updates in self.staged.items():
+            sheet = self.sheet(name)
+            for qid, values in updates.items():
+                row = sheet.row_for(qid)
+                sheet.ws.cell(row, sheet.col("id_question"), qid)
+                for column, value in values.items():
+                    sheet.ws.cell(row, sheet.col(column, create=True), value)
+        self.staged.clear()
+        path = Path(path or self.path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        self.wb.save(tmp)
+        os.replace(tmp, path)
@@ -1,44 +1,58 @@
-# command: `python build_pdfs.py`
+# command: `python build_pdfs.py [--tests A B ... | --all] [--output Tests_ABCD.pdf]`
 
-import subprocess
+import argparse
+import io
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from PyPDF2 import PdfReader, PdfWriter
 
+from build_test_pdf import load_bank, profiling, render_test, test_questions
+from pdf_params import TEST_IDS
 
-def generate_all_tests():
-    script_path = Path(__file__).parent / "build_test_pdf.py"
+PARALLEL_MIN_TESTS = 8
 
-    for test_id in ["A", "B", "C", "D"]:
-        print(f"Generating test {test_id}...")
-        result = subprocess.run(
-            [sys.executable, str(script_path), test_id], capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            print(f"Error generating test {test_id}: {result.stderr}")
-            sys.exit(1)
-        print(result.stdout.strip())
 
+def generate_all_tests(test_ids=TEST_IDS):
+    """Render every model in this interpreter; return {test_id: (pdf bytes, page count)}.
 
-def build_tests_abcd(tests_dir, public_dir):
-    generate_all_tests()
+    The question bank and fonts are loaded once. With many models the renders
+    fan out over a process pool; for the usual four, pool startup costs more
+    than it saves.
+    """
+    with profiling.timer("pdf load bank"):
+        bank = load_bank()
+    questions = [[q["texto"] for q in test_questions(bank, t)] for t in test_ids]
+    try:
+        if len(test_ids) >= PARALLEL_MIN_TESTS:
+            with ProcessPoolExecutor() as pool:
+                render = partial(profiling.in_worker, profiling.metrics.enabled, render_test)
+                pdfs = [profiling.gather(r) for r in pool.map(render, test_ids, questions)]
+        else:
+            pdfs = [render_test(t, qs) for t, qs in zip(test_ids, questions)]
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    return dict(zip(test_ids, pdfs))
 
-    test_pdfs = [tests_dir / f"test_{t}.pdf" for t in ["A", "B", "C", "D"]]
-    for pdf in test_pdfs:
-        if not pdf.exists():
-            print(f"Error: No se encontró {pdf}")
-            sys.exit(1)
 
-    writer = PdfWriter()
-    for test_id, pdf_path in zip(["A", "B", "C", "D"], test_pdfs):
-        for page in PdfReader(str(pdf_path)).pages:
-            writer.add_page(page)
-        print(f"Añadido: test_{test_id}.pdf")
+def build_tests_abcd(public_dir, test_ids=TEST_IDS, output_name="Tests_ABCD.pdf"):
+    pdfs = generate_all_tests(test_ids)
 
-    output = public_dir / "Tests_ABCD.pdf"
-    with open(str(output), "wb") as f:
+    writer = PdfWriter()
+    for test_id in test_ids:
+        pdf, pages = pdfs[test_id]
+        with profiling.timer("pdf merge"):
+            for page in PdfReader(io.BytesIO(pdf)).pages:
+                writer.add_page(page)
+        print(f"Añadido: test {test_id} ({pages} páginas)")
+
+    output = public_dir / output_name
+    with profiling.timer("pdf write"), open(str(output), "wb") as f:
         writer.write(f)
-    print(f"✅ public/pdfs/Tests_ABCD.pdf ({len(PdfReader(str(output)).pages)} páginas)")
+    total = sum(pages for _, pages in pdfs.values())
+    print(f"✅ public/pdfs/{output_name} ({total} páginas)")
 
 
 def build_docs_alumnado(assets_dir, public_dir):
@@ -58,17 +72,28 @@ def build_docs_alumnado(assets_dir, public_dir):
         print(f"Añadido: {pdf_path.name}")
 
     output = public_dir / "Docs_Alumnado.pdf"
-    with open(str(output), "wb") as f:
+    with profiling.timer("pdf write"), open(str(output), "wb") as f:
         writer.write(f)
-    print(f"✅ public/pdfs/Docs_Alumnado.pdf ({len(PdfReader(str(output)).pages)} páginas)")
+    print(f"✅ public/pdfs/Docs_Alumnado.pdf ({len(writer.pages)} páginas)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the printable PDFs in public/pdfs.")
+    parser.add_argument("--tests", nargs="+", help=f"test models to include (default {' '.join(TEST_IDS)})")
+    parser.add_argument("--all", action="store_true", help="include every test in the 'tests' sheet")
+    parser.add_argument("--output", default="Tests_ABCD.pdf", help="merged tests file name")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    profiling.start(args)
+    test_ids = sorted(load_bank()["tests"]) if args.all else args.tests or TEST_IDS
     utils_dir = Path(__file__).parent
-    tests_dir = utils_dir / "tests"
     assets_dir = utils_dir.parent.parent / "assets"
     public_dir = utils_dir.parent.parent / "public" / "pdfs"
     public_dir.mkdir(exist_ok=True)
 
-    build_tests_abcd(tests_dir, public_dir)
+    build_tests_abcd(public_dir, test_ids, args.output)
     build_docs_alumnado(assets_dir, public_dir)
@@ -0,0 +1,204 @@
+# command: `python build_personalized.py --count 1000 [--models A B C D] [--chunk 200] [--zip] [--workers N] [--batch NAME]`
+"""Per-student copies of the paper tests, each with its own sheet id and QR code.
+
+Sheets take the models round-robin (A, B, C, D, A, ...) so neighbouring
+students get different models. Every sheet gets a sheet id, a uuid5 of the
+batch name and sheet number, so rebuilding a batch reproduces the same ids.
+The QR code in the top-left corner encodes `fermi:<model>:<sheet id>`. The
+first 8 characters of the id are printed next to it and in every page footer,
+which lets loose pages be matched by hand.
+
+Sheets are rendered in chunks, one canvas and one merged PDF per chunk, spread
+over a process pool; chunks are sized so every worker gets one, with --chunk
+as the upper limit. Within a chunk each model's pages are drawn once as PDF
+forms, and every sheet is those forms plus its own QR and code. Each chunk is
+written to disk as soon as it is done, so memory stays bounded by the chunk
+size. With --zip the chunks are moved into
+one ZIP file as they complete. manifest.csv lists sheet id, model, file and
+first page of every sheet.
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+from build_test_pdf import draw_test, get_context, load_bank, profiling, test_questions
+from pdf_params import TEST_IDS, PDFParams as PDF
+
+OUTPUT_DIR = Path(__file__).parent / "personalized"
+SHEET_NAMESPACE = uuid.UUID("5d0c3f1e-8f7a-4c1b-9e43-2a6f3b8d7c10")
+CHUNK_SIZE = 200
+QR_SIZE = 1.7 * cm
+
+
+def sheet_id(batch: str, n: int) -> str:
+    return str(uuid.uuid5(SHEET_NAMESPACE, f"{batch}/{n}"))
+
+
+def qr_payload(model: str, sid: str) -> str:
+    return f"fermi:{model}:{sid}"
+
+
+def plan_sheets(batch: str, count: int, models: list[str]) -> list[dict]:
+    sheets = []
+    for n in range(count):
+        sid = sheet_id(batch, n)
+        sheets.append({"n": n + 1, "sheet_id": sid, "code": sid[:8].upper(), "test_model": models[n % len(models)]})
+    return sheets
+
+
+def draw_qr(c, payload: str, x: float, y: float, size: float = QR_SIZE):
+    # Sized directly: getBounds() plus a transform would encode the QR twice.
+    widget = QrCodeWidget(payload, barBorder=0, barWidth=size, barHeight=size)
+    drawing = Drawing(size, size)
+    drawing.add(widget)
+    renderPDF.draw(drawing, c, x, y)
+
+
+def stamp(c, sheet: dict, page_num: int):
+    """The per-sheet part of a page: QR on the first page, sheet code on every footer."""
+    height = A4[1]
+    if page_num == 1:
+        x, top = PDF.MARGIN_HORIZONTAL, height - 0.5 * cm
+        draw_qr(c, qr_payload(sheet["test_model"], sheet["sheet_id"]), x, top - QR_SIZE)
+        c.setFont("Helvetica", 7)
+        c.drawString(x + QR_SIZE + 0.2 * cm, top - QR_SIZE, sheet["code"])
+    c.setFont("Helvetica", 8)
+    c.drawString(2 * cm, 1 * cm, sheet["code"])
+
+
+def page_forms(c, model: str, questions: list[str], ctx) -> list[str]:
+    """Draw a model's pages once as forms on c; return their names, one per page."""
+    names = [f"{model}_1"]
+
+    def next_form():
+        c.endForm()
+        names.append(f"{model}_{len(names) + 1}")
+        c.beginForm(names[-1])
+
+    c.beginForm(names[0])
+    draw_test(c, model, questions, ctx, page_break=next_form)
+    c.endForm()
+    return names
+
+
+def render_chunk(path: Path, sheets: list[dict], questions: dict[str, list[str]]) -> list[tuple[int, int]]:
+    """Draw the sheets on one canvas saved to path; return (first page, page count) per sheet."""
+    ctx = get_context()
+    c = canvas.Canvas(str(path), pagesize=A4)
+    models = {sheet["test_model"] for sheet in sheets}
+    forms = {m: page_forms(c, m, questions[m], ctx) for m in sorted(models)}
+    placed = []
+    page = 1
+    for i, sheet in enumerate(sheets):
+        for page_num, form in enumerate(forms[sheet["test_model"]], 1):
+            if i or page_num > 1:
+                c.showPage()
+            c.doForm(form)
+            stamp(c, sheet, page_num)
+        pages = len(forms[sheet["test_model"]])
+        placed.append((page, pages))
+        page += pages
+    with profiling.timer("pdf save"):
+        c.save()
+    return placed
+
+
+def write_manifest(path: Path, rows: list[dict]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["n", "sheet_id", "code", "test_model", "file", "first_page", "pages"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_personalized(
+    count: int,
+    models: list[str] = TEST_IDS,
+    batch: str | None = None,
+    chunk: int = CHUNK_SIZE,
+    as_zip: bool = False,
+    workers: int | None = None,
+    output_dir: Path = OUTPUT_DIR,
+) -> Path:
+    batch = batch or datetime.now().strftime("%Y%m%d-%H%M%S")
+    bank = load_bank()
+    questions = {m: [q["texto"] for q in test_questions(bank, m)] for m in models}
+    sheets = plan_sheets(batch, count, models)
+    workers = workers or os.cpu_count()
+    # One chunk per worker, so the whole pool is busy; --chunk caps its size.
+    size = max(1, min(chunk, math.ceil(count / workers)))
+    chunks = [sheets[i:i + size] for i in range(0, len(sheets), size)]
+
+    out = output_dir / batch
+    out.mkdir(parents=True, exist_ok=True)
+    zip_path = output_dir / f"{batch}.zip"
+    archive = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) if as_zip else None
+
+    start = time.monotonic()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for k, part in enumerate(chunks):
+            path = out / f"sheets_{k + 1:04d}.pdf"
+            job = pool.submit(profiling.in_worker, profiling.metrics.enabled, render_chunk, path, part, questions)
+            futures[job] = (path, part)
+        for done, future in enumerate(as_completed(futures), 1):
+            path, part = futures[future]
+            for sheet, (first, pages) in zip(part, profiling.gather(future.result())):
+                rows.append({**sheet, "file": path.name, "first_page": first, "pages": pages})
+            if archive:
+                with profiling.timer("pdf zip"):
+                    archive.write(path, path.name)
+                path.unlink()
+            print(f"  {done}/{len(chunks)} {path.name} ({len(part)} hojas)")
+
+    rows.sort(key=lambda r: r["n"])
+    write_manifest(out / "manifest.csv", rows)
+    if archive:
+        archive.write(out / "manifest.csv", "manifest.csv")
+        archive.close()
+        (out / "manifest.csv").unlink()
+        out.rmdir()
+        out = zip_path
+
+    elapsed = time.monotonic() - start
+    print(f"✅ {count} hojas en {len(chunks)} PDFs -> {out} ({elapsed:.1f}s)")
+    return out
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build per-student test sheets with QR codes.")
+    parser.add_argument("--count", type=int, required=True, help="number of sheets")
+    parser.add_argument("--models", nargs="+", default=TEST_IDS, help=f"test models to cycle (default {' '.join(TEST_IDS)})")
+    parser.add_argument("--batch", help="batch name; the same name reproduces the same sheet ids (default: timestamp)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help=f"max sheets per merged PDF (default {CHUNK_SIZE})")
+    parser.add_argument("--zip", action="store_true", help="write one ZIP instead of a directory of PDFs")
+    parser.add_argument("--workers", type=int, help="render processes (default: CPU count)")
+    profiling.add_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiling.start(args)
+    available = load_bank()["tests"]
+    unknown = [m for m in args.models if m not in available]
+    if unknown:
+        print(f"Error: modelos desconocidos {', '.join(unknown)}; disponibles: {', '.join(available)}")
+        sys.exit(1)
+    build_personalized(args.count, args.models, args.batch, args.chunk, args.zip, args.workers)
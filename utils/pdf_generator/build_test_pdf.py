@@ -1,11 +1,13 @@
 # command: `python utils/pdf_generator/build_test_pdf.py C`
+import argparse
+import io
 import sys
 from pathlib import Path
-import openpyxl
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus import Paragraph
 from reportlab.lib.enums import TA_LEFT
 from reportlab.pdfbase import pdfmetrics
@@ -13,69 +15,129 @@ from reportlab.pdfbase.ttfonts import TTFont
 
 from pdf_params import PDFParams as PDF
 
+sys.path.append(str(Path(__file__).resolve().parents[1] / "question_bank"))
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from compile_questions import load_bank, test_questions
+import profiling
+
 pdfmetrics.registerFont(TTFont('DejaVu', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
 
-def load_test_questions(test_id):
-    # Get project root (2 levels up from this script)
-    project_root = Path(__file__).parent.parent.parent
-    questions_file = project_root / "public" / "questions.xlsx"
-
-    wb = openpyxl.load_workbook(str(questions_file))
-    tests_sheet = wb['tests']
-    questions_sheet = wb['questions']
-
-    q_headers = [questions_sheet.cell(1, col).value for col in range(1, questions_sheet.max_column + 1)]
-    col_id = q_headers.index('id_question') + 1
-    col_text = q_headers.index('question') + 1
-
-    questions = {}
-    for i in range(2, questions_sheet.max_row + 1):
-        q_id = questions_sheet.cell(i, col_id).value
-        text = questions_sheet.cell(i, col_text).value
-        if q_id is not None and text:
-            questions[q_id] = text
-
-    t_headers = [tests_sheet.cell(1, col).value for col in range(1, tests_sheet.max_column + 1)]
-    col_test = t_headers.index('test') + 1
-    col_q_id = t_headers.index('id_question') + 1
-    col_q_num = t_headers.index('question_number') + 1
-
-    test_entries = []
-    for i in range(2, tests_sheet.max_row + 1):
-        t_id = tests_sheet.cell(i, col_test).value
-        q_id = tests_sheet.cell(i, col_q_id).value
-        q_num = tests_sheet.cell(i, col_q_num).value
-        if t_id == test_id and q_id is not None:
-            test_entries.append((q_num, questions.get(q_id, 'NOT FOUND')))
-    test_questions = [text for _, text in sorted(test_entries, key=lambda x: x[0])]
-
-    return test_questions
+EMOJI_PATH = Path(__file__).parent / "emoji_dart.png"
+INTRO_TEXTS = [
+    "Hay muchas respuestas correctas, la clave es usar la lógica para dar una cifra con sentido.",
+    "Puedes hacer cuentas en sucio en esta hoja. Puedes usar calculadora.",
+]
+
+class RenderContext:
+    """Styles, images and wrapped paragraphs shared by every test drawn in this process.
+
+    Paragraphs are wrapped once per (text, width) and drawn as many times as
+    needed; the dart emoji is decoded once and, within a canvas, reportlab
+    registers it as a single image XObject used by every page.
+    """
+
+    def __init__(self):
+        self._base = getSampleStyleSheet()['Normal']
+        self._styles = {}
+        self._paragraphs = {}
+        self.question_style = self.style("Helvetica-Bold", 12, 15)
+        self.intro_style = self.style("Helvetica", 13, 14)
+        self.emoji = ImageReader(str(EMOJI_PATH))
+
+    def style(self, font_name, font_size, leading):
+        key = (font_name, font_size, leading)
+        if key not in self._styles:
+            self._styles[key] = ParagraphStyle(
+                f"{font_name}-{font_size}-{leading}", parent=self._base,
+                fontName=font_name, fontSize=font_size, leading=leading, alignment=TA_LEFT,
+            )
+        return self._styles[key]
+
+    def paragraph(self, text, style, width):
+        """(Paragraph, height) wrapped to width, built once per text, style and width."""
+        key = (text, style.name, width)
+        if key not in self._paragraphs:
+            p = Paragraph(text, style)
+            w, h = p.wrap(width, 1000)
+            self._paragraphs[key] = (p, h)
+        return self._paragraphs[key]
+
+_context = None
+
+def get_context():
+    global _context
+    if _context is None:
+        _context = RenderContext()
+    return _context
+
+def load_test_questions(test_id, bank=None):
+    bank = bank or load_bank()
+    return [q["texto"] for q in test_questions(bank, test_id)]
 
 def draw_text_wrapped(c, text, x, y, max_width, font_name="Helvetica", font_size=11, leading=14):
-    style = getSampleStyleSheet()['Normal']
-    style.fontName = font_name
-    style.fontSize = font_size
-    style.leading = leading
-    style.alignment = TA_LEFT
-
-    p = Paragraph(text, style)
-    w, h = p.wrap(max_width, 1000)
+    ctx = get_context()
+    p, h = ctx.paragraph(text, ctx.style(font_name, font_size, leading), max_width)
     p.drawOn(c, x, y - h)
     return h
 
-def generate_pdf(test_id):
-    questions = load_test_questions(test_id)
-
-    if len(questions) != 8:
-        print(f"Error: Se esperaban 8 preguntas para el test {test_id}, se encontraron {len(questions)}")
-        return
-
-    # Get data directory relative to this script
-    tests_dir = Path(__file__).parent / "tests"
-    tests_dir.mkdir(exist_ok=True)
-
-    filename = tests_dir / f"test_{test_id}.pdf"
-    c = canvas.Canvas(str(filename), pagesize=A4)
+def block_height(text_height, answer_space):
+    """Height of one question: text, gap, then answer space down to its separator."""
+    return text_height + PDF.QUESTION_TEXT_GAP + answer_space
+
+def paginate(text_heights, first_page_space, page_space):
+    """Pack questions onto pages; return [(question indices, answer space), ...].
+
+    Questions are placed greedily with the minimum answer space. The space left
+    over on each page is then shared equally between its questions, up to the
+    maximum answer space. The last question on a page has no separator, so it
+    only needs to reach its answer box bottom.
+
+    Eight-question tests keep the 4 + 4 layout they have always been printed
+    with (minimum answer space, then maximum), even where a long question takes
+    page 1 below CONTENT_BOTTOM, so new prints match the copies already handed out.
+    """
+    if len(text_heights) == 8:
+        return [([0, 1, 2, 3], PDF.ANSWER_MIN_SPACE), ([4, 5, 6, 7], PDF.ANSWER_MAX_SPACE)]
+
+    def needed(heights, answer_space):
+        if not heights:
+            return 0
+        total = sum(block_height(h, answer_space) for h in heights)
+        return total + (len(heights) - 1) * PDF.QUESTION_AFTER_SEPARATOR_SPACING - PDF.ANSWER_BOX_LINE_GAP
+
+    pages = []
+    current = []
+    available = first_page_space
+    for i, h in enumerate(text_heights):
+        candidate = [text_heights[j] for j in current] + [h]
+        if current and needed(candidate, PDF.ANSWER_MIN_SPACE) > available:
+            pages.append((current, available))
+            current = []
+            available = page_space
+        current.append(i)
+    if current or not pages:
+        pages.append((current, available))
+
+    laid_out = []
+    for indices, space in pages:
+        heights = [text_heights[j] for j in indices]
+        spare = space - needed(heights, PDF.ANSWER_MIN_SPACE)
+        extra = max(0, spare / max(1, len(indices)))
+        laid_out.append((indices, min(PDF.ANSWER_MAX_SPACE, PDF.ANSWER_MIN_SPACE + extra)))
+    return laid_out
+
+@profiling.timed("pdf draw")
+def draw_test(c, test_id, questions, ctx=None, page_break=None):
+    """Draw one test model on canvas c, starting on its current page; return the page count.
+
+    The last page is left open, so callers can add more tests to the same canvas
+    after a showPage(). page_break() starts every page after the first; it is
+    c.showPage by default (build_personalized records each page as a form instead).
+    """
+    if not questions:
+        raise ValueError(f"El test {test_id} no tiene preguntas")
+
+    ctx = ctx or get_context()
     width, height = A4
 
     margin_left = PDF.MARGIN_HORIZONTAL
@@ -101,13 +163,11 @@ def generate_pdf(test_id):
 
         emoji_y = y_pos - 0.2 * cm
 
-        # Get emoji path relative to this script
-        emoji_path = Path(__file__).parent / "emoji_dart.png"
-        c.drawImage(str(emoji_path), start_x, emoji_y, width=emoji_size, height=emoji_size, preserveAspectRatio=True, anchor='sw', mask='auto')
+        c.drawImage(ctx.emoji, start_x, emoji_y, width=emoji_size, height=emoji_size, preserveAspectRatio=True, anchor='sw', mask='auto')
         title_x = start_x + emoji_size + spacing
         c.drawString(title_x, y_pos, title_text)
         emoji_right_x = title_x + title_width + spacing
-        c.drawImage(str(emoji_path), emoji_right_x, emoji_y, width=emoji_size, height=emoji_size, preserveAspectRatio=True, anchor='sw', mask='auto')
+        c.drawImage(ctx.emoji, emoji_right_x, emoji_y, width=emoji_size, height=emoji_size, preserveAspectRatio=True, anchor='sw', mask='auto')
 
         y_pos -= 0.5 * cm
         c.setFont("Helvetica", 10)
@@ -206,22 +266,18 @@ def generate_pdf(test_id):
         c.rect(x1, y1, x2 - x1, y2 - y1)
         c.rect(x1 - gap, y1 - gap, (x2 - x1) + 2 * gap, (y2 - y1) + 2 * gap)
 
-    def draw_question_text(y_pos, question_num, question_text):
+    def question_paragraph(question_num, question_text):
         full_text = f"<b>{question_num}. {question_text}</b>"
-        style = getSampleStyleSheet()['Normal']
-        style.fontName = "Helvetica-Bold"
-        style.fontSize = 12
-        style.leading = 15
-        style.alignment = TA_LEFT
-        p = Paragraph(full_text, style)
-        w, h = p.wrap(content_width, 1000)
+        return ctx.paragraph(full_text, ctx.question_style, content_width)
+
+    def draw_question_text(y_pos, paragraph):
+        p, h = paragraph
         p.drawOn(c, margin_left, y_pos - h)
-        return y_pos - h - 0.1 * cm
+        return y_pos - h - PDF.QUESTION_TEXT_GAP
 
-    def render_question(y_pos, question_num, question_text, draw_separator=True, page=1):
-        y_pos = draw_question_text(y_pos, question_num, question_text)
-        total_space = PDF.ANSWER_TOTAL_SPACE_PAGE1 if page == 1 else PDF.ANSWER_TOTAL_SPACE_PAGE2
-        separator_y = y_pos - total_space
+    def render_question(y_pos, paragraph, answer_space, draw_separator=True):
+        y_pos = draw_question_text(y_pos, paragraph)
+        separator_y = y_pos - answer_space
         box_top_y = y_pos - 0.1 * cm
         box_bottom_y = separator_y + PDF.ANSWER_BOX_LINE_GAP
         box_height = box_top_y - box_bottom_y
@@ -241,15 +297,11 @@ def generate_pdf(test_id):
 
         return separator_y - PDF.QUESTION_AFTER_SEPARATOR_SPACING
 
-    def render_questions_page(y_pos, start_idx, end_idx, page=1):
+    def render_questions_page(y_pos, indices, answer_space):
         c.setFont("Helvetica-Bold", 12)
-        for i in range(start_idx, end_idx):
-            question_num = i + 1
-            question_text = questions[i]
-            draw_separator = (i < end_idx - 1)
-            y_pos = render_question(y_pos, question_num, question_text, draw_separator, page)
-            if y_pos < PDF.MARGIN_BOTTOM:
-                break
+        for i in indices:
+            draw_separator = (i != indices[-1])
+            y_pos = render_question(y_pos, paragraphs[i], answer_space, draw_separator)
         return y_pos
 
     def draw_footer(page_num):
@@ -264,40 +316,63 @@ def generate_pdf(test_id):
     y = draw_form_fields(y)
     draw_demographics_box(top_y=form_top_y, bottom_y=y + 0.3 * cm)
     y += 0.1 * cm
-    intro_style = getSampleStyleSheet()['Normal']
-    intro_style.fontName = "Helvetica"
-    intro_style.fontSize = 13
-    intro_style.leading = 14
-    intro_style.alignment = TA_LEFT
-    for text in [
-        "Hay muchas respuestas correctas, la clave es usar la lógica para dar una cifra con sentido.",
-        "Puedes hacer cuentas en sucio en esta hoja. Puedes usar calculadora.",
-    ]:
-        p = Paragraph(text, intro_style)
-        w, h = p.wrap(content_width, 1000)
+    for text in INTRO_TEXTS:
+        p, h = ctx.paragraph(text, ctx.intro_style, content_width)
         p.drawOn(c, margin_left, y - h)
         y -= h + 0.3 * cm
     y -= 0.3 * cm
-    y = render_questions_page(y, 0, 4, page=1)  # 4 questions on page 1 (compact)
-    draw_footer(1)
 
-    c.showPage()
-    y = height - PDF.MARGIN_TOP
-    y = render_questions_page(y, 4, 8, page=2)  # 4 questions on page 2 (spacious)
-    draw_footer(2)
+    paragraphs = [question_paragraph(i + 1, text) for i, text in enumerate(questions)]
+    page_top = height - PDF.MARGIN_TOP
+    pages = paginate(
+        [h for _, h in paragraphs],
+        first_page_space=y - PDF.CONTENT_BOTTOM,
+        page_space=page_top - PDF.CONTENT_BOTTOM,
+    )
+    for page_num, (indices, answer_space) in enumerate(pages, 1):
+        if page_num > 1:
+            (page_break or c.showPage)()
+            y = page_top
+        render_questions_page(y, indices, answer_space)
+        draw_footer(page_num)
+    return len(pages)
+
+def render_test(test_id, questions):
+    """Render one test model to PDF bytes in memory; return (pdf bytes, page count)."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    pages = draw_test(c, test_id, questions)
+    with profiling.timer("pdf save"):
+        c.save()
+    return buffer.getvalue(), pages
+
+def generate_pdf(test_id):
+    try:
+        pdf, pages = render_test(test_id, load_test_questions(test_id))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    # Get data directory relative to this script
+    tests_dir = Path(__file__).parent / "tests"
+    tests_dir.mkdir(exist_ok=True)
 
-    c.save()
-    print(f"PDF generado: {filename}")
+    filename = tests_dir / f"test_{test_id}.pdf"
+    filename.write_bytes(pdf)
+    print(f"PDF generado: {filename} ({pages} páginas)")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Uso: python generate_pdf.py [A|B|C|D]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Genera el PDF de un modelo de test.")
+    parser.add_argument("modelo", help="cualquier test de la hoja 'tests', p. ej. A")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
 
-    test_id = sys.argv[1].upper()
+    test_id = args.modelo.upper()
 
-    if test_id not in ['A', 'B', 'C', 'D']:
-        print("Error: El modelo debe ser A, B, C o D")
+    available = load_bank()["tests"]
+    if test_id not in available:
+        print(f"Error: El modelo debe ser uno de: {', '.join(available)}")
         sys.exit(1)
 
     generate_pdf(test_id)
@@ -1,11 +1,13 @@
 from dataclasses import dataclass
 from reportlab.lib.units import cm
 
+TEST_IDS = ["A", "B", "C", "D"]
+
 @dataclass
 class PDFParams:
     MARGIN_HORIZONTAL = 1.25 * cm
     MARGIN_TOP = 1.5 * cm
-    MARGIN_BOTTOM = 3 * cm
+    CONTENT_BOTTOM = 0.6 * cm  # lowest point of the last answer box on a page
 
     FORM_BOX_HEIGHT = 1 * cm
     FORM_BOX_WIDTH = 4 * cm
@@ -26,5 +28,7 @@ class PDFParams:
     ANSWER_BOX_HEIGHT = 2 * cm
     ANSWER_BOX_LINE_GAP = 0.3 * cm
 
-    ANSWER_TOTAL_SPACE_PAGE1 = 3.4 * cm
-    ANSWER_TOTAL_SPACE_PAGE2 = 5.5 * cm
+    QUESTION_TEXT_GAP = 0.1 * cm
+    # Answer space below each question text; pages stretch it up to the max
+    ANSWER_MIN_SPACE = 3.4 * cm
+    ANSWER_MAX_SPACE = 5.5 * cm
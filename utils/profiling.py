@@ -0,0 +1,208 @@
+"""Timers, counters and histograms for the command-line tools, and their --profile flag.
+
+Instrumented code calls timer(), observe() and count() unconditionally. Nothing
+is recorded unless start() turned profiling on, so the cost when it is off is
+one flag check. When the process exits a summary table goes to stderr:
+calls, total, p50/p95/max per timer or histogram, then the counters (bytes,
+tokens, cache hits...). --profile-json writes the same numbers, with every
+sample, to a file. --profile-cprofile also runs cProfile (main thread only) and
+dumps its stats for pstats or snakeviz.
+
+Scripts outside utils/ reach this module with
+sys.path.append(str(ROOT / "utils")).
+"""
+
+import atexit
+import cProfile
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.samples = {}  # name -> [values]
+        self.units = {}  # name -> "s", "B", ...
+        self.counters = {}
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.units.clear()
+            self.counters.clear()
+
+    def observe(self, name: str, value: float, unit: str = ""):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(name, []).append(value)
+            self.units.setdefault(name, unit)
+
+    def count(self, name: str, n: float = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "samples": {k: list(v) for k, v in self.samples.items()},
+                "units": dict(self.units),
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot: dict | None):
+        """Add a snapshot taken elsewhere, e.g. in a pool worker process."""
+        if not snapshot or not self.enabled:
+            return
+        with self.lock:
+            for name, values in snapshot["samples"].items():
+                self.samples.setdefault(name, []).extend(values)
+                self.units.setdefault(name, snapshot["units"].get(name, ""))
+            for name, n in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> str:
+        data = self.snapshot()
+        lines = [f"{'':44s} {'calls':>7s} {'total':>9s} {'p50':>9s} {'p95':>9s} {'max':>9s}"]
+        for name in sorted(data["samples"]):
+            values = sorted(data["samples"][name])
+            unit = data["units"][name]
+            cells = [fmt(v, unit) for v in (sum(values), quantile(values, 0.5), quantile(values, 0.95), values[-1])]
+            lines.append(f"{name[:44]:44s} {len(values):7d} " + " ".join(f"{c:>9s}" for c in cells))
+        for name in sorted(data["counters"]):
+            lines.append(f"{name[:44]:44s} {fmt(data['counters'][name], 'B' if 'bytes' in name else ''):>7s}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+def quantile(values: list[float], q: float) -> float:
+    """Nearest-rank quantile of sorted values."""
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def fmt(value: float, unit: str) -> str:
+    if unit == "s":
+        return f"{value * 1000:.1f}ms" if value < 1 else f"{value:.2f}s"
+    if unit == "B":
+        for scale, suffix in ((1 << 30, "GB"), (1 << 20, "MB"), (1 << 10, "KB")):
+            if value >= scale:
+                return f"{value / scale:.1f}{suffix}"
+        return f"{value:.0f}B"
+    return f"{value:g}"
+
+
+def observe(name: str, value: float, unit: str = ""):
+    metrics.observe(name, value, unit)
+
+
+def count(name: str, n: float = 1):
+    metrics.count(name, n)
+
+
+@contextmanager
+def timer(name: str):
+    if not metrics.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - start, "s")
+
+
+def timed(name: str):
+    """Decorator form of timer()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_session(session, prefix: str = "http"):
+    """Time every response of a requests session per method and path, and count bytes in and out.
+
+    The latency is requests' `elapsed`: up to the response headers. Streamed
+    bodies are not read here; their callers count what they read.
+    """
+    def hook(resp, *args, stream=False, **kwargs):
+        if not metrics.enabled:
+            return
+        req = resp.request
+        metrics.observe(f"{prefix} {req.method} {urlsplit(req.url).path}", resp.elapsed.total_seconds(), "s")
+        body = req.body or b""
+        metrics.count(f"{prefix} bytes out", len(body.encode() if isinstance(body, str) else body))
+        if not stream:
+            metrics.count(f"{prefix} bytes in", len(resp.content))
+        if resp.status_code >= 400:
+            metrics.count(f"{prefix} errors ({resp.status_code})")
+
+    session.hooks["response"].append(hook)
+    return session
+
+
+def in_worker(enabled: bool, fn, *args):
+    """Run fn(*args) in a pool worker; return (result, the worker's metrics) for gather()."""
+    if not enabled:
+        return fn(*args), None
+    metrics.reset()
+    metrics.enabled = True
+    try:
+        return fn(*args), metrics.snapshot()
+    finally:
+        metrics.enabled = False
+
+
+def gather(item):
+    result, snapshot = item
+    metrics.merge(snapshot)
+    return result
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile", action="store_true", help="print timings, transfer and token counts at exit")
+    group.add_argument("--profile-json", type=Path, metavar="PATH", help="also write the metrics as JSON")
+    group.add_argument("--profile-cprofile", type=Path, metavar="PATH",
+                       help="also write cProfile stats of the main thread (open with pstats or snakeviz)")
+
+
+def start(args, label: str = "total"):
+    """Start collecting if args asks for profiling; the report is printed when the process exits."""
+    if not (args.profile or args.profile_json or args.profile_cprofile):
+        return
+    metrics.reset()
+    metrics.enabled = True
+    profiler = cProfile.Profile() if args.profile_cprofile else None
+    began = time.perf_counter()
+    if profiler:
+        profiler.enable()
+
+    def report():
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile_cprofile)
+        metrics.observe(label, time.perf_counter() - began, "s")
+        metrics.enabled = False
+        print(f"\n{metrics.summary()}", file=sys.stderr)
+        if args.profile_json:
+            args.profile_json.write_text(json.dumps(metrics.snapshot(), indent=2))
+            print(f"Profile -> {args.profile_json}", file=sys.stderr)
+        if profiler:
+            print(f"cProfile -> {args.profile_cprofile}", file=sys.stderr)
+
+    atexit.register(report)
@@ -0,0 +1,18 @@
+// Run before `vite build` (npm prebuild): the deployed public/questions.json must be
+// compiled from the deployed public/questions.xlsx, or the app would serve stale questions.
+import { createHash } from 'node:crypto'
+import { readFileSync, existsSync } from 'node:fs'
+
+const xlsx = new URL('../../public/questions.xlsx', import.meta.url)
+const json = new URL('../../public/questions.json', import.meta.url)
+const fix = 'run `python utils/question_bank/compile_questions.py` and commit public/questions.json'
+
+if (!existsSync(json)) {
+  console.error(`public/questions.json is missing: ${fix}`)
+  process.exit(1)
+}
+const sha = createHash('sha256').update(readFileSync(xlsx)).digest('hex')
+if (JSON.parse(readFileSync(json, 'utf8')).source_sha256 !== sha) {
+  console.error(`public/questions.json is out of date with public/questions.xlsx: ${fix}`)
+  process.exit(1)
+}
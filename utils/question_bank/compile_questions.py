@@ -0,0 +1,190 @@
+# command: `python utils/question_bank/compile_questions.py [--force] [--columnar]`
+"""Compile public/questions.xlsx into a small validated public/questions.json.
+
+The web app, the PDF builder and the analysis jobs read the JSON instead of
+unzipping and parsing the workbook. The JSON records the sha256 of the xlsx it
+was built from and is only rebuilt when that hash changes. It is committed:
+`npm run build` fails if it does not match the xlsx (check_compiled.mjs). --columnar also
+writes questions.columns.json (one array per column) for analysis.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import profiling
+
+ROOT = Path(__file__).resolve().parents[2]
+XLSX_PATH = ROOT / "public" / "questions.xlsx"
+JSON_PATH = ROOT / "public" / "questions.json"
+COLUMNS_PATH = Path(__file__).parent / "questions.columns.json"
+FORMAT_VERSION = 1
+
+
+class QuestionBankError(ValueError):
+    pass
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def num(value):
+    if value is None or value == "":
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def read_sheet(wb, name: str) -> list[dict]:
+    rows = wb[name].iter_rows(values_only=True)
+    header = next(rows)
+    return [dict(zip(header, values)) for values in rows]
+
+
+def compile_workbook(path: Path = XLSX_PATH) -> tuple[dict, list[str]]:
+    """Return (compiled bank, warnings); raise QuestionBankError listing every data error."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    errors, warnings = [], []
+
+    questions = []
+    seen = set()
+    for n, row in enumerate(read_sheet(wb, "questions"), 2):
+        if not row.get("question"):
+            continue
+        where = f"questions!{n}"
+        try:
+            qid = int(row["id_question"])
+            p05, p95 = num(row.get("p05")), num(row.get("p95"))
+            difficulty, elo = num(row.get("difficulty_manual")), num(row.get("elo"))
+        except (TypeError, ValueError) as e:
+            errors.append(f"{where}: non-numeric value ({e})")
+            continue
+        if qid in seen:
+            errors.append(f"{where}: duplicate id_question {qid}")
+        seen.add(qid)
+        if (p05 is None) != (p95 is None):
+            warnings.append(f"{where}: id {qid} has only one of p05/p95, treated as no range")
+            p05 = p95 = None
+        elif p05 is not None and not 0 < p05 < p95:
+            errors.append(f"{where}: id {qid} needs 0 < p05 < p95, got {p05}, {p95}")
+        questions.append({"id": qid, "texto": row["question"], "p05": p05, "p95": p95, "difficulty": difficulty, "elo": elo})
+
+    entries = {}
+    for n, row in enumerate(read_sheet(wb, "tests"), 2):
+        test_id, qid, number = row.get("test"), row.get("id_question"), row.get("question_number")
+        if test_id is None and qid is None:
+            continue
+        where = f"tests!{n}"
+        if test_id is None or qid is None or number is None:
+            errors.append(f"{where}: test, id_question and question_number are required")
+            continue
+        if int(qid) not in seen:
+            errors.append(f"{where}: test {test_id} references unknown question {qid}")
+        numbers = entries.setdefault(str(test_id), {})
+        if int(number) in numbers:
+            errors.append(f"{where}: test {test_id} has question_number {number} twice")
+        numbers[int(number)] = int(qid)
+
+    tests = {}
+    for test_id, numbers in sorted(entries.items()):
+        if sorted(numbers) != list(range(1, len(numbers) + 1)):
+            warnings.append(f"tests: test {test_id} question numbers are not 1..{len(numbers)}")
+        tests[test_id] = [numbers[k] for k in sorted(numbers)]
+
+    wb.close()
+    if errors:
+        raise QuestionBankError("\n".join(errors))
+    bank = {
+        "version": FORMAT_VERSION,
+        "source_sha256": file_sha256(path),
+        "questions": sorted(questions, key=lambda q: q["id"]),
+        "tests": tests,
+    }
+    return bank, warnings
+
+
+def to_columns(bank: dict) -> dict:
+    columns = {key: [q[key] for q in bank["questions"]] for key in ("id", "texto", "p05", "p95", "difficulty", "elo")}
+    columns["tests"] = {t: ids for t, ids in bank["tests"].items()}
+    return columns
+
+
+def read_compiled(sha: str) -> dict | None:
+    """questions.json, if it was compiled from the xlsx with this hash by this FORMAT_VERSION."""
+    if not JSON_PATH.exists():
+        return None
+    bank = json.loads(JSON_PATH.read_text(encoding="utf-8"))
+    return bank if bank.get("source_sha256") == sha and bank.get("version") == FORMAT_VERSION else None
+
+
+def build(force: bool = False, columnar: bool = False, quiet: bool = False) -> dict:
+    """Rebuild questions.json if the xlsx changed (or force); return the compiled bank."""
+    with profiling.timer("bank hash"):
+        sha = file_sha256(XLSX_PATH)
+    bank = None if force else read_compiled(sha)
+    if bank:
+        if columnar and not COLUMNS_PATH.exists():
+            COLUMNS_PATH.write_text(json.dumps(to_columns(bank), ensure_ascii=False, separators=(",", ":")))
+        if not quiet:
+            print(f"{JSON_PATH.relative_to(ROOT)} is up to date")
+        return bank
+
+    with profiling.timer("bank compile"):
+        bank, warnings = compile_workbook(XLSX_PATH)
+    for w in warnings:
+        print(f"  ⚠ {w}")
+    with profiling.timer("bank write"):
+        JSON_PATH.write_text(json.dumps(bank, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        if columnar:
+            COLUMNS_PATH.write_text(json.dumps(to_columns(bank), ensure_ascii=False, separators=(",", ":")))
+    if not quiet:
+        print(f"✅ {JSON_PATH.relative_to(ROOT)}: {len(bank['questions'])} questions, tests {', '.join(bank['tests'])}")
+    return bank
+
+
+def load_bank() -> dict:
+    """Compiled question bank for Python consumers.
+
+    Read from questions.json when it matches the xlsx, otherwise compiled in
+    memory. Only running this script writes the file, which is committed and
+    checked by `npm run build`.
+    """
+    with profiling.timer("bank hash"):
+        sha = file_sha256(XLSX_PATH)
+    bank = read_compiled(sha)
+    if bank is None:
+        print(f"  ⚠ {JSON_PATH.relative_to(ROOT)} is out of date; run compile_questions.py and commit it")
+        with profiling.timer("bank compile"):
+            bank, _ = compile_workbook(XLSX_PATH)
+    return bank
+
+
+def test_questions(bank: dict, test_id: str) -> list[dict]:
+    by_id = {q["id"]: q for q in bank["questions"]}
+    if test_id not in bank["tests"]:
+        raise QuestionBankError(f"Test '{test_id}' not found; available: {', '.join(bank['tests'])}")
+    return [by_id[qid] for qid in bank["tests"][test_id]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="rebuild even if the xlsx hash is unchanged")
+    parser.add_argument("--columnar", action="store_true", help=f"also write {COLUMNS_PATH.name}")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args)
+    try:
+        build(force=args.force, columnar=args.columnar)
+    except QuestionBankError as e:
+        print(f"Error en questions.xlsx:\n{e}")
+        sys.exit(1)